@@ -0,0 +1,296 @@
+# Benchmark aggregation job
+# Builds per-industry benchmark statistics from the analyses recorded in
+# the history store and publishes them as a runtime distributions file
+# (BENCHMARK_PUBLISHED_FILE). /api/benchmarks prefers that file over the
+# built-in one, which stays untouched under source control. Each metric
+# keeps a count, a sum and a merging t-digest, so memory stays bounded by
+# industries x metrics x compression however many analyses accumulate. Runs are incremental: the digests and
+# the last analysis id folded in are checkpointed in benchmark_state, and
+# only newer analyses are read on the next run. Snapshots carry a version
+# number and replace the published file atomically.
+#
+#   cd backend
+#   python benchmark_aggregator.py                      # one incremental pass
+#   python benchmark_aggregator.py --interval 300       # keep running every 5 minutes
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import BENCHMARK_DISTRIBUTIONS_FILE, BENCHMARK_PUBLISHED_FILE
+from history_store import get_history_store
+from routes.benchmarks import INDUSTRY_BENCHMARKS, benchmark_metric_values, normalize_industry
+
+STATE_NAME = "industry_benchmarks"
+
+# Analysis section each benchmark metric is read from; "unknown" status means insufficient data
+METRIC_SECTIONS = {
+    "expense_ratio": "expense_ratio",
+    "cash_flow_stability": "cash_flow_stability",
+    "working_capital_gap": "working_capital",
+    "debt_to_revenue": "debt_burden"
+}
+
+SNAPSHOT_PERCENTILES = [0, 1, 5, 10, 20, 25, 30, 40, 50, 60, 70, 75, 80, 90, 95, 99, 100]
+
+class TDigest:
+    """Merging t-digest with the k1 (arcsine) scale function"""
+
+    def __init__(self, compression: float = 100, means: Optional[list] = None, weights: Optional[list] = None,
+                 minimum: float = math.inf, maximum: float = -math.inf):
+        self.compression = compression
+        self.means = np.asarray(means or [], dtype=np.float64)
+        self.weights = np.asarray(weights or [], dtype=np.float64)
+        self.minimum = minimum
+        self.maximum = maximum
+        self._buffer: list = []
+
+    def add(self, value: float):
+        self._buffer.append(value)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._flush()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inverse(self, k: float) -> float:
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        means = np.concatenate((self.means, self._buffer))
+        weights = np.concatenate((self.weights, np.ones(len(self._buffer))))
+        self._buffer = []
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        
+        merged_means, merged_weights = [], []
+        current_mean, current_weight = means[0], weights[0]
+        q_left = 0.0
+        q_limit = self._k_inverse(self._k(q_left) + 1)
+        for mean, weight in zip(means[1:].tolist(), weights[1:].tolist()):
+            if q_left + (current_weight + weight) / total <= q_limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                merged_means.append(current_mean)
+                merged_weights.append(current_weight)
+                q_left += current_weight / total
+                q_limit = self._k_inverse(self._k(q_left) + 1)
+                current_mean, current_weight = mean, weight
+        merged_means.append(current_mean)
+        merged_weights.append(current_weight)
+        self.means = np.array(merged_means)
+        self.weights = np.array(merged_weights)
+
+    def quantiles(self, qs: np.ndarray) -> np.ndarray:
+        """Values at quantiles qs (0-1), interpolated between centroid centres"""
+        self._flush()
+        if not self.weights.size:
+            return np.full(np.shape(qs), np.nan)
+        total = self.weights.sum()
+        centres = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0.0], centres, [total]))
+        values = np.concatenate(([self.minimum], self.means, [self.maximum]))
+        # Centroid means can sit fractionally outside [min, max] after merging
+        values = np.clip(values, self.minimum, self.maximum)
+        return np.interp(np.asarray(qs) * total, positions, values)
+
+    def to_state(self) -> dict:
+        self._flush()
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.minimum,
+            "max": self.maximum
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TDigest":
+        return cls(state["compression"], state["means"], state["weights"], state["min"], state["max"])
+
+class MetricStats:
+    """Count, mean and streaming quantiles of one metric within one industry"""
+
+    def __init__(self, count: int = 0, total: float = 0.0, digest: Optional[TDigest] = None, compression: float = 100):
+        self.count = count
+        self.total = total
+        self.digest = digest or TDigest(compression)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.digest.add(value)
+
+    def summary(self) -> dict:
+        values = self.digest.quantiles(np.array(SNAPSHOT_PERCENTILES) / 100)
+        values = np.maximum.accumulate(values)
+        return {
+            "percentiles": SNAPSHOT_PERCENTILES,
+            "values": [round(value, 4) for value in values.tolist()],
+            "count": self.count,
+            "mean": round(self.total / self.count, 4),
+            "source": "observed",
+            "median": round(float(self.digest.quantiles(np.array([0.5]))[0]), 4)
+        }
+
+    def to_state(self) -> dict:
+        return {"count": self.count, "total": self.total, "digest": self.digest.to_state()}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "MetricStats":
+        return cls(state["count"], state["total"], TDigest.from_state(state["digest"]))
+
+class BenchmarkAggregator:
+    """Per-industry MetricStats plus the id of the last analysis folded in"""
+
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self.watermark = 0
+        self.version = 0
+        self.industries: Dict[str, Dict[str, MetricStats]] = {}
+
+    def add(self, industry: str, analysis: dict):
+        values = benchmark_metric_values(analysis)
+        stats = self.industries.setdefault(normalize_industry(industry), {})
+        for metric, section in METRIC_SECTIONS.items():
+            if analysis.get(section, {}).get("status", "unknown") == "unknown":
+                continue
+            value = float(values[metric])
+            if not math.isfinite(value):
+                continue
+            if metric not in stats:
+                stats[metric] = MetricStats(compression=self.compression)
+            stats[metric].add(value)
+
+    def update(self, store, batch_size: int = 1000) -> int:
+        """Fold in analyses recorded since the last run; returns how many were read"""
+        added = 0
+        for analysis_id, industry, analysis in store.iter_industry_analyses(self.watermark, batch_size):
+            self.add(industry, analysis)
+            self.watermark = analysis_id
+            added += 1
+        if added:
+            self.version += 1
+        return added
+
+    def snapshot(self, min_samples: int, base: Optional[dict] = None) -> dict:
+        """Distributions file contents; industries with too few analyses keep their base entry"""
+        industries = dict((base or {}).get("industries", {}))
+        # Base tables keep the base file's source label per metric, since the snapshot has none of its own
+        base_source = (base or {}).get("source")
+        if base_source:
+            industries = {
+                industry: {**entry, "metrics": {
+                    metric: {"source": base_source, **spec} for metric, spec in entry.get("metrics", {}).items()
+                }}
+                for industry, entry in industries.items()
+            }
+        for industry, stats in self.industries.items():
+            metrics = {metric: metric_stats.summary() for metric, metric_stats in stats.items()
+                       if metric_stats.count >= min_samples}
+            if not metrics:
+                continue
+            entry = dict(industries.get(industry, {}))
+            entry["name"] = INDUSTRY_BENCHMARKS.get(industry, {}).get("name", industry)
+            entry["metrics"] = {**entry.get("metrics", {}), **metrics}
+            industries[industry] = entry
+        return {
+            "version": self.version,
+            "generated_at": time.time(),
+            "analyses_through": self.watermark,
+            "description": f"Built from stored analyses by benchmark_aggregator.py (at least {min_samples} per metric).",
+            "industries": industries
+        }
+
+    def to_state(self) -> dict:
+        return {
+            "compression": self.compression,
+            "watermark": self.watermark,
+            "version": self.version,
+            "industries": {
+                industry: {metric: metric_stats.to_state() for metric, metric_stats in stats.items()}
+                for industry, stats in self.industries.items()
+            }
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BenchmarkAggregator":
+        aggregator = cls(state["compression"])
+        aggregator.watermark = state["watermark"]
+        aggregator.version = state["version"]
+        aggregator.industries = {
+            industry: {metric: MetricStats.from_state(metric_state) for metric, metric_state in stats.items()}
+            for industry, stats in state["industries"].items()
+        }
+        return aggregator
+
+def read_snapshot(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def publish_snapshot(snapshot: dict, path: str):
+    """Write next to the target and rename over it, so readers see the old or new file, never a partial one"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f.name, path)
+
+def run_once(store, output: str, min_samples: int, compression: float, batch_size: int) -> dict:
+    state = store.get_benchmark_state(STATE_NAME)
+    aggregator = BenchmarkAggregator.from_state(state) if state else BenchmarkAggregator(compression)
+    added = aggregator.update(store, batch_size)
+    # Checkpoint before publishing, so a crash in between never folds the same analyses in twice
+    if added:
+        store.save_benchmark_state(STATE_NAME, aggregator.to_state())
+    
+    published = read_snapshot(output)
+    if aggregator.version and (published or {}).get("version") != aggregator.version:
+        publish_snapshot(aggregator.snapshot(min_samples, published or read_snapshot(BENCHMARK_DISTRIBUTIONS_FILE)), output)
+        return {"added": added, "version": aggregator.version, "published": True}
+    return {"added": added, "version": aggregator.version, "published": False}
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate stored analyses into industry benchmark distributions")
+    parser.add_argument("--output", "-o", default=BENCHMARK_PUBLISHED_FILE, help="Distributions file to publish")
+    parser.add_argument("--min-samples", type=int, default=30, help="Analyses needed before a metric replaces its base table")
+    parser.add_argument("--compression", type=float, default=100, help="t-digest compression (new state only)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Analyses read per query")
+    parser.add_argument("--interval", type=float, default=0, help="Repeat every N seconds instead of running once")
+    args = parser.parse_args()
+    
+    store = get_history_store()
+    if not store:
+        print("HISTORY_DB_PATH is not set; nothing to aggregate", file=sys.stderr)
+        sys.exit(1)
+    
+    while True:
+        result = run_once(store, args.output, args.min_samples, args.compression, args.batch_size)
+        print(
+            f"{result['added']} new analyses, version {result['version']}"
+            + (f" published to {args.output}" if result["published"] else ""),
+            file=sys.stderr
+        )
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
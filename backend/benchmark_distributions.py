@@ -0,0 +1,178 @@
+# Benchmark distributions
+# Per-industry, per-metric distributions loaded from a JSON file into
+# sorted arrays, so a metric's percentile rank among industry peers is a
+# binary search (np.interp) rather than a comparison with one average.
+# A metric is either a quantile table ("percentiles" + "values") or raw
+# "samples", which become exact mid-rank percentiles. The file is re-read
+# when its modification time changes, so workers pick up new tables
+# without a restart. benchmark_aggregator.py publishes a separate runtime
+# file from stored analyses, adding each metric's observed mean; once it
+# exists it takes precedence over the built-in file shipped with the repo.
+# Every table carries a "source" (per metric, or file-wide): the built-in
+# tables are "synthetic" spreads around the industry averages, the
+# aggregator's are "observed", and responses say which kind they used.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import BENCHMARK_DISTRIBUTIONS_FILE, BENCHMARK_PUBLISHED_FILE, BENCHMARK_RELOAD_INTERVAL_SECONDS
+
+# Whether a higher metric value ranks better, matching compare_analysis
+METRIC_HIGHER_IS_BETTER = {
+    "expense_ratio": False,
+    "cash_flow_stability": True,
+    "working_capital_gap": False,
+    "debt_to_revenue": False
+}
+
+class PercentileTable:
+    """Percentile rank of a metric value by interpolating a sorted table"""
+
+    def __init__(self, values: np.ndarray, percentiles: np.ndarray):
+        # Collapse repeated values onto their mean percentile so interpolation is well defined
+        self.values, inverse = np.unique(values, return_inverse=True)
+        self.percentiles = np.bincount(inverse, weights=percentiles) / np.bincount(inverse)
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "PercentileTable":
+        if "samples" in spec:
+            samples = np.sort(np.asarray(spec["samples"], dtype=np.float64))
+            if not samples.size:
+                raise ValueError("samples must not be empty")
+            # Mid-rank: share of peers below plus half of those tied
+            values, counts = np.unique(samples, return_counts=True)
+            percentiles = (np.cumsum(counts) - counts / 2) / samples.size * 100
+            return cls(values, percentiles)
+        
+        values = np.asarray(spec["values"], dtype=np.float64)
+        percentiles = np.asarray(spec["percentiles"], dtype=np.float64)
+        if values.size != percentiles.size or not values.size:
+            raise ValueError("percentiles and values must be non-empty and the same length")
+        if np.any(np.diff(values) < 0) or np.any(np.diff(percentiles) < 0):
+            raise ValueError("percentiles and values must both be non-decreasing")
+        return cls(values, percentiles)
+
+    def rank(self, x: np.ndarray) -> np.ndarray:
+        """Percent of peers below each value, 0 below the table and 100 above it"""
+        return np.interp(x, self.values, self.percentiles, left=0.0, right=100.0)
+
+class DistributionSet:
+    """One loaded distributions file"""
+
+    def __init__(self, version: str, industries: Dict[str, Dict[str, PercentileTable]], names: Dict[str, str],
+                 means: Optional[Dict[str, Dict[str, float]]] = None,
+                 sources: Optional[Dict[str, Dict[str, str]]] = None):
+        self.version = version
+        self.industries = industries
+        self.names = names
+        self.means = means or {}
+        self.sources = sources or {}
+        self.loaded_at = time.time()
+
+    def table(self, industry: str, metric: str) -> Optional[PercentileTable]:
+        return self.industries.get(industry, {}).get(metric)
+
+    def source(self, industry: str, metric: str) -> Optional[str]:
+        return self.sources.get(industry, {}).get(metric)
+
+    def is_synthetic(self, industry: str, metric: str) -> bool:
+        return self.source(industry, metric) == "synthetic"
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "synthetic": any(
+                self.is_synthetic(industry, metric) for industry, tables in self.industries.items() for metric in tables
+            ),
+            "industries": {
+                industry: {
+                    "name": self.names.get(industry, industry),
+                    "metrics": sorted(tables),
+                    "sources": {metric: self.source(industry, metric) for metric in sorted(tables)}
+                }
+                for industry, tables in self.industries.items()
+            }
+        }
+
+def parse_distributions(content: bytes) -> DistributionSet:
+    data = json.loads(content)
+    industries, names, means, sources = {}, {}, {}, {}
+    default_source = str(data.get("source", "unspecified"))
+    for industry, spec in data.get("industries", {}).items():
+        tables = {}
+        for metric, metric_spec in spec.get("metrics", {}).items():
+            try:
+                tables[metric] = PercentileTable.from_spec(metric_spec)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid distribution for {industry}.{metric}: {e}")
+            if "mean" in metric_spec:
+                means.setdefault(industry, {})[metric] = float(metric_spec["mean"])
+            sources.setdefault(industry, {})[metric] = str(metric_spec.get("source", default_source))
+        industries[industry] = tables
+        names[industry] = spec.get("name", industry)
+    # Published snapshots carry their own version; hand-written files are versioned by content
+    version = str(data["version"]) if "version" in data else hashlib.sha256(content).hexdigest()[:16]
+    return DistributionSet(version, industries, names, means, sources)
+
+class DistributionStore:
+    """The current DistributionSet, reloaded when the file on disk changes"""
+
+    def __init__(self, path: str, check_interval: float, published_path: str = ""):
+        self.path = path
+        self.published_path = published_path
+        self.loaded_path: Optional[str] = None
+        self.check_interval = check_interval
+        self.current_set = DistributionSet("none", {}, {})
+        self.last_error: Optional[str] = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if path or published_path:
+            self.reload()
+
+    def source_path(self) -> str:
+        """The published snapshot when there is one, else the built-in file"""
+        if self.published_path and os.path.exists(self.published_path):
+            return self.published_path
+        return self.path
+
+    def reload(self) -> bool:
+        """Re-read the file if it changed; a bad file keeps the previous tables"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            path = self.source_path()
+            try:
+                stat = os.stat(path)
+                signature = (path, stat.st_mtime_ns, stat.st_size)
+                if signature == self._signature:
+                    return False
+                # Remember the signature up front so a bad file is reported once, not every check
+                self._signature = signature
+                with open(path, "rb") as f:
+                    self.current_set = parse_distributions(f.read())
+                self.loaded_path = path
+                self.last_error = None
+                return True
+            except (OSError, ValueError) as e:
+                self.last_error = str(e)
+                print(f"Benchmark distributions not loaded from {path}: {e}")
+                return False
+
+    def current(self) -> DistributionSet:
+        if (self.path or self.published_path) and time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+        return self.current_set
+
+    def describe(self) -> dict:
+        return {**self.current().describe(), "path": self.loaded_path, "last_error": self.last_error}
+
+distribution_store = DistributionStore(
+    BENCHMARK_DISTRIBUTIONS_FILE, BENCHMARK_RELOAD_INTERVAL_SECONDS, BENCHMARK_PUBLISHED_FILE
+)
@@ -0,0 +1,74 @@
+# Upload processing: legacy whole-DataFrame path vs lean columnar path
+#
+#   cd backend && python -m benchmarks.bench_upload --rows 100000
+
+import argparse
+import io
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import make_financial_frame, to_file_bytes
+from columnar import encode_financial_data
+from routes.upload import detect_columns, validate_and_process_file
+
+def legacy_process(content: bytes) -> str:
+    """The pre-columnar pipeline: full read, raw_data dicts, per-column lists"""
+    df = pd.read_csv(io.BytesIO(content))
+    detected_columns = detect_columns(df)
+    financial_data = {
+        field: pd.to_numeric(df[column], errors='coerce').dropna().tolist()
+        for field, column in detected_columns.items()
+    }
+    result = {
+        "summary": {"total_rows": len(df), "preview": df.head(5).to_dict(orient='records')},
+        "financial_data": financial_data,
+        "raw_data": df.to_dict(orient='records')
+    }
+    return json.dumps({"summary": result["summary"], "financial_data": result["financial_data"]})
+
+def lean_process(content: bytes, fmt: str) -> str:
+    result = validate_and_process_file(content, "bench.csv")
+    return json.dumps({"summary": result["summary"], "financial_data": encode_financial_data(result["financial_data"], fmt)})
+
+def measure(func, *args, repeats: int = 3) -> dict:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        body = func(*args)
+        timings.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        "best_ms": round(min(timings) * 1000, 1),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+        "response_kb": round(len(body) / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy and lean upload processing")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    content = to_file_bytes(make_financial_frame(args.rows))
+    print(f"{args.rows} rows, {len(content) / 1024 / 1024:.1f} MB CSV")
+    
+    results = {
+        "legacy": measure(legacy_process, content, repeats=args.repeats),
+        "lean_json": measure(lean_process, content, "json", repeats=args.repeats),
+        "lean_columnar": measure(lean_process, content, "columnar", repeats=args.repeats)
+    }
+    
+    print(f"{'path':<16}{'best ms':>10}{'peak MB':>10}{'body KB':>12}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['best_ms']:>10}{stats['peak_mb']:>10}{stats['response_kb']:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# XLSX ingestion: legacy full-sheet read_excel vs header-first column-pruned path
+#
+#   cd backend && python -m benchmarks.bench_xlsx --rows 10000,100000,1000000 --extra-columns 12
+#
+# Workbooks this size take a while to generate; pass --cache-dir to keep them
+# between runs.
+
+import argparse
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import load_file_bytes
+from routes.upload import detect_columns, excel_engine, to_series, validate_and_process_file
+
+def legacy_process(content: bytes) -> int:
+    """The previous path: every cell of the sheet through the default engine"""
+    df = pd.read_excel(io.BytesIO(content))
+    detected_columns = detect_columns(df)
+    financial_data = {field: to_series(df[column]) for field, column in detected_columns.items()}
+    return len(financial_data)
+
+def pruned_process(content: bytes) -> int:
+    return len(validate_and_process_file(content, "bench.xlsx")["financial_data"])
+
+def measure(func, content: bytes, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    func(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {"best_s": round(min(timings), 2), "peak_mb": round(peak / 1024 / 1024, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy and column-pruned XLSX ingestion")
+    parser.add_argument("--rows", default="10000,100000,1000000", help="Comma-separated workbook sizes")
+    parser.add_argument("--extra-columns", type=int, default=12, help="Filler columns alongside the financial ones")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--cache-dir", default="", help="Keep generated workbooks here between runs")
+    args = parser.parse_args()
+    
+    print(f"engine: {excel_engine('bench.xlsx')}, {args.extra_columns} filler columns")
+    print(f"{'rows':>10}{'MB':>8}{'legacy s':>11}{'legacy MB':>11}{'pruned s':>11}{'pruned MB':>11}{'speedup':>9}")
+    
+    for rows in (int(value) for value in args.rows.split(",")):
+        content = load_file_bytes(rows, args.extra_columns, "xlsx", args.cache_dir)
+        legacy = measure(legacy_process, content, args.repeats)
+        pruned = measure(pruned_process, content, args.repeats)
+        speedup = legacy["best_s"] / pruned["best_s"] if pruned["best_s"] else float("inf")
+        print(
+            f"{rows:>10}{len(content) / 1024 / 1024:>8.1f}{legacy['best_s']:>11}{legacy['peak_mb']:>11}"
+            f"{pruned['best_s']:>11}{pruned['peak_mb']:>11}{speedup:>8.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# Stub OpenAI-compatible LLM server for benchmarks and load tests
+# Answers /v1/chat/completions, plain or streamed, with canned text after a
+# configurable time to first token and per-token delay, so the insights
+# paths can be measured without network access or an API key. Start it in
+# a background thread with FakeLLMServer, or standalone:
+#
+#   cd backend && python -m benchmarks.fake_llm --port 8765 --first-token-ms 300 --token-ms 20
+#   GROQ_API_KEY=x GROQ_BASE_URL=http://127.0.0.1:8765/v1 uvicorn main:app
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = ("Your", " business", " shows", " steady", " revenue", " with", " room", " to", " trim", " expenses.")
+
+@dataclass
+class FakeLLMSettings:
+    first_token_ms: float = 50
+    token_ms: float = 0
+    tokens: int = 64
+    prompt_tokens: int = 400
+
+def completion_text(tokens: int) -> list:
+    return [WORDS[i % len(WORDS)] for i in range(tokens)]
+
+def create_app(settings: FakeLLMSettings) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+
+    def usage() -> dict:
+        return {
+            "prompt_tokens": settings.prompt_tokens,
+            "completion_tokens": settings.tokens,
+            "total_tokens": settings.prompt_tokens + settings.tokens
+        }
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        return "data: " + json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "fake",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }) + "\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        words = completion_text(min(settings.tokens, body.get("max_tokens") or settings.tokens))
+        
+        if body.get("stream"):
+            async def events():
+                await asyncio.sleep(settings.first_token_ms / 1000)
+                for i, word in enumerate(words):
+                    if i and settings.token_ms:
+                        await asyncio.sleep(settings.token_ms / 1000)
+                    yield chunk({"content": word})
+                yield chunk({}, "stop")
+                yield "data: " + json.dumps({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "choices": [],
+                                             "created": int(time.time()), "model": "fake", "usage": usage()}) + "\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+        
+        await asyncio.sleep((settings.first_token_ms + settings.token_ms * max(len(words) - 1, 0)) / 1000)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "fake",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)}, "finish_reason": "stop"}],
+            "usage": usage()
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": app.state.calls}
+    
+    return app
+
+class FakeLLMServer:
+    """Runs the stub on its own thread and event loop; port 0 picks a free port"""
+
+    def __init__(self, settings: FakeLLMSettings = None, host: str = "127.0.0.1", port: int = 0):
+        self.app = create_app(settings or FakeLLMSettings())
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="fake-llm", daemon=True)
+        self.host = host
+        self.port = port
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def calls(self) -> int:
+        return self.app.state.calls
+
+    def start(self) -> "FakeLLMServer":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Fake LLM server did not start")
+            time.sleep(0.01)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--first-token-ms", type=float, default=50, help="Fake LLM delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=0, help="Fake LLM delay between tokens")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens in each fake completion")
+
+def settings_from_args(args) -> FakeLLMSettings:
+    return FakeLLMSettings(first_token_ms=args.first_token_ms, token_ms=args.token_ms, tokens=args.tokens)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub OpenAI-compatible chat completions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    
+    uvicorn.run(create_app(settings_from_args(args)), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
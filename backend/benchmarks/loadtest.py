@@ -0,0 +1,316 @@
+# Load test: concurrent dashboard sessions against one uvicorn worker
+# Starts main:app in a subprocess with one worker, wired to the stub LLM
+# from fake_llm.py running in this process. Closed-loop virtual users then
+# replay a mix of sessions for a fixed time at each concurrency level. A
+# session is upload -> calculate -> compare, optionally followed by plain
+# or streamed insights. Reports throughput, per-step latency percentiles,
+# errors, and the app's event loop lag and LLM queue wait, read from
+# /api/metrics before and after each level.
+#
+#   cd backend
+#   python -m benchmarks.loadtest --users 1,8,32,128 --duration 20 --first-token-ms 400 --token-ms 15
+#   LLM_MAX_CONCURRENCY=8 python -m benchmarks.loadtest --mix streaming:1
+#   python -m benchmarks.loadtest --url http://127.0.0.1:5000   # a server you started yourself
+#
+# Every insights request names a different business, so it always reaches
+# the LLM instead of the insights cache. One generator process tops out
+# at a few thousand requests a second; past that it measures itself.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_llm import FakeLLMServer, add_arguments, settings_from_args
+from benchmarks.synthetic import make_financial_frame, to_file_bytes
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SESSION_STEPS = {
+    "analysis": ("upload", "calculate", "compare"),
+    "dashboard": ("upload", "calculate", "compare", "insights"),
+    "streaming": ("upload", "calculate", "compare", "insights_stream")
+}
+
+class LevelStats:
+    """Latencies and errors per session step for one concurrency level"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.sessions = 0
+
+    def record(self, step: str, seconds: float, ok: bool):
+        if ok:
+            self.latencies[step].append(seconds)
+        else:
+            self.errors[step] += 1
+
+    @property
+    def requests(self) -> int:
+        # First-event timings are part of an insights_stream request, not extra requests
+        return sum(len(values) for step, values in self.latencies.items() if not step.endswith("_first_event")) \
+            + sum(self.errors.values())
+
+    def summary(self) -> dict:
+        steps = {}
+        for step, values in self.latencies.items():
+            p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+            steps[step] = {"count": len(values), "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1)}
+        return {"steps": steps, "errors": dict(self.errors)}
+
+async def upload(client: httpx.AsyncClient, session: dict) -> bool:
+    response = await client.post("/api/upload/file", files={"file": ("ledger.csv", session["file"], "text/csv")})
+    if response.status_code != 200:
+        return False
+    session["financial_data"] = response.json()["financial_data"]
+    return True
+
+async def calculate(client: httpx.AsyncClient, session: dict) -> bool:
+    response = await client.post("/api/analysis/calculate", json={"financial_data": session["financial_data"], "industry": "services"})
+    if response.status_code != 200:
+        return False
+    session["analysis"] = response.json()
+    return True
+
+async def compare(client: httpx.AsyncClient, session: dict) -> bool:
+    response = await client.post("/api/benchmarks/compare", json={"industry": "services", "analysis_data": session["analysis"]})
+    return response.status_code == 200
+
+def insights_body(session: dict) -> dict:
+    return {"analysis_data": session["analysis"], "industry": "services", "business_name": f"Business {session['id']}"}
+
+async def insights(client: httpx.AsyncClient, session: dict) -> bool:
+    response = await client.post("/api/insights/generate", json=insights_body(session))
+    return response.status_code == 200
+
+async def insights_stream(client: httpx.AsyncClient, session: dict) -> bool:
+    started = time.perf_counter()
+    async with client.stream("POST", "/api/insights/generate/stream", json=insights_body(session)) as response:
+        if response.status_code != 200:
+            return False
+        first_event = None
+        async for line in response.aiter_lines():
+            if first_event is None and line.startswith("data:"):
+                first_event = time.perf_counter() - started
+            if '"error"' in line:
+                return False
+    if first_event is not None:
+        session["stats"].record("insights_stream_first_event", first_event, True)
+    return True
+
+STEPS = {
+    "upload": upload,
+    "calculate": calculate,
+    "compare": compare,
+    "insights": insights,
+    "insights_stream": insights_stream
+}
+
+async def virtual_user(client: httpx.AsyncClient, stats: LevelStats, deadline: float, files: List[bytes],
+                       mix: List[tuple], rng: random.Random, think_seconds: float, counter: list):
+    kinds, weights = zip(*mix)
+    while time.monotonic() < deadline:
+        counter[0] += 1
+        session = {"id": counter[0], "file": rng.choice(files), "stats": stats}
+        for step in SESSION_STEPS[rng.choices(kinds, weights)[0]]:
+            started = time.perf_counter()
+            try:
+                ok = await STEPS[step](client, session)
+            except httpx.HTTPError:
+                ok = False
+            stats.record(step, time.perf_counter() - started, ok)
+            if not ok:
+                break
+            if think_seconds:
+                await asyncio.sleep(think_seconds)
+        else:
+            stats.sessions += 1
+
+def histogram_buckets(text: str, name: str, label: str = "") -> Dict[float, float]:
+    """Cumulative bucket counts of a Prometheus histogram, summed over series containing label"""
+    buckets: Dict[float, float] = defaultdict(float)
+    prefix = name + "_bucket{"
+    for line in text.splitlines():
+        if not line.startswith(prefix) or label not in line:
+            continue
+        labels, value = line[len(prefix):].rsplit("} ", 1)
+        le = labels.split('le="', 1)[1].split('"', 1)[0]
+        buckets[float(le)] += float(value)
+    return buckets
+
+def bucket_quantile(before: Dict[float, float], after: Dict[float, float], q: float) -> Optional[float]:
+    """Upper bound (ms) of the bucket holding quantile q of the observations made between two scrapes"""
+    bounds = sorted(after)
+    counts = [after[bound] - before.get(bound, 0.0) for bound in bounds]
+    if not counts or not counts[-1]:
+        return None
+    for bound, count in zip(bounds, counts):
+        if count >= q * counts[-1]:
+            return bound * 1000
+    return None
+
+async def scrape(client: httpx.AsyncClient) -> str:
+    try:
+        response = await client.get("/api/metrics")
+        return response.text if response.status_code == 200 else ""
+    except httpx.HTTPError:
+        return ""
+
+async def run_level(base_url: str, users: int, duration: float, files: List[bytes], mix: List[tuple],
+                    think_seconds: float, seed: int) -> dict:
+    stats = LevelStats()
+    limits = httpx.Limits(max_connections=users + 1, max_keepalive_connections=users + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=httpx.Timeout(120.0)) as client:
+        before = await scrape(client)
+        started = time.monotonic()
+        counter = [seed * 1_000_000]
+        await asyncio.gather(*(
+            virtual_user(client, stats, started + duration, files, mix, random.Random(seed * 1000 + i), think_seconds, counter)
+            for i in range(users)
+        ))
+        elapsed = time.monotonic() - started
+        after = await scrape(client)
+    
+    result = {
+        "users": users,
+        "elapsed_s": round(elapsed, 2),
+        "sessions": stats.sessions,
+        "sessions_per_s": round(stats.sessions / elapsed, 2),
+        "requests_per_s": round(stats.requests / elapsed, 2),
+        **stats.summary()
+    }
+    if after:
+        lag = ("fincheck_event_loop_lag_seconds", "")
+        queue = ("fincheck_span_duration_seconds", 'span="llm_queue_wait"')
+        result["event_loop_lag_ms"] = {
+            f"p{int(q * 100)}": bucket_quantile(histogram_buckets(before, *lag), histogram_buckets(after, *lag), q)
+            for q in (0.5, 0.99)
+        }
+        result["llm_queue_wait_ms"] = {
+            f"p{int(q * 100)}": bucket_quantile(histogram_buckets(before, *queue), histogram_buckets(after, *queue), q)
+            for q in (0.5, 0.99)
+        }
+    return result
+
+def print_level(result: dict):
+    lag = result.get("event_loop_lag_ms", {})
+    queue = result.get("llm_queue_wait_ms", {})
+    print(
+        f"\n{result['users']} users: {result['requests_per_s']} req/s, {result['sessions_per_s']} sessions/s, "
+        f"errors {sum(result['errors'].values())}, loop lag p50/p99 <= {lag.get('p50')}/{lag.get('p99')} ms, "
+        f"LLM queue wait p99 <= {queue.get('p99')} ms",
+        file=sys.stderr
+    )
+    for step, stats in result["steps"].items():
+        print(f"  {step:<30}{stats['count']:>8}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}",
+              file=sys.stderr)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_app(llm_url: str, history_db: str) -> tuple:
+    """main:app on one uvicorn worker; inherits this environment, so LLM_* limits etc. can be varied per run"""
+    port = free_port()
+    env = {**os.environ, "GROQ_API_KEY": "loadtest", "GROQ_BASE_URL": llm_url, "HISTORY_DB_PATH": history_db,
+           "METRICS_ENABLED": "true"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("App exited during startup")
+        try:
+            if httpx.get(base_url + "/api/health").status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("App did not become healthy within 30 seconds")
+
+def parse_mix(value: str) -> List[tuple]:
+    mix = []
+    for part in value.split(","):
+        kind, _, weight = part.partition(":")
+        if kind not in SESSION_STEPS:
+            raise argparse.ArgumentTypeError(f"Unknown session type {kind!r}; choose from {', '.join(SESSION_STEPS)}")
+        mix.append((kind, float(weight or 1)))
+    return mix
+
+async def run_levels(args, base_url: str, files: List[bytes]) -> List[dict]:
+    # One untimed session of each type first, so import and first-call costs stay out of the lowest level
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(120.0)) as client:
+        for index, kind in enumerate(SESSION_STEPS):
+            session = {"id": -index - 1, "file": files[0], "stats": LevelStats()}
+            for step in SESSION_STEPS[kind]:
+                await STEPS[step](client, session)
+    
+    results = []
+    for index, users in enumerate(args.users):
+        result = await run_level(base_url, users, args.duration, files, args.mix, args.think_ms / 1000, index + 1)
+        print_level(result)
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test one uvicorn worker with realistic dashboard sessions")
+    parser.add_argument("--users", default="1,4,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per concurrency level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("dashboard:5,analysis:4,streaming:1"),
+                        help=f"Weighted session types from {', '.join(SESSION_STEPS)}, e.g. dashboard:5,streaming:1")
+    parser.add_argument("--rows", type=int, default=24, help="Rows in each uploaded file")
+    parser.add_argument("--distinct-files", type=int, default=50, help="Different files users pick from (repeats hit the upload cache)")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause between a session's steps")
+    parser.add_argument("--url", default="", help="Test a running server instead of starting one (its LLM settings are its own)")
+    parser.add_argument("--output", "-o", default="", help="Write results as JSON")
+    add_arguments(parser)
+    args = parser.parse_args()
+    args.users = [int(value) for value in args.users.split(",")]
+    
+    files = [to_file_bytes(make_financial_frame(args.rows, seed=seed)) for seed in range(args.distinct_files)]
+    
+    if args.url:
+        results = asyncio.run(run_levels(args, args.url.rstrip("/"), files))
+    else:
+        with FakeLLMServer(settings_from_args(args)) as llm, tempfile.TemporaryDirectory() as tmp:
+            process, base_url = start_app(llm.base_url, os.path.join(tmp, "history.db"))
+            try:
+                results = asyncio.run(run_levels(args, base_url, files))
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+    
+    best = max(results, key=lambda result: result["requests_per_s"])
+    print(f"\nsaturation: {best['requests_per_s']} req/s at {best['users']} users", file=sys.stderr)
+    
+    if args.output:
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "args": {**{key: value for key, value in vars(args).items() if key != "output"}, "mix": dict(args.mix)},
+            "saturation": {"users": best["users"], "requests_per_s": best["requests_per_s"]},
+            "levels": results
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# Benchmark suite: ingestion, scoring, benchmarking and insights
+# Times detect_columns and validate_and_process_file on synthetic CSV/XLSX
+# files (narrow, or 300 columns wide) of each requested size, then
+# /api/analysis/calculate, /api/benchmarks/compare and /api/insights/generate
+# through the app against the stub LLM in fake_llm.py. Each case reports
+# latency percentiles, throughput and peak RSS; results are written as JSON
+# so a later run can be compared against them.
+#
+#   cd backend
+#   python -m benchmarks.run_suite --rows 12,10000,1000000 --cache-dir /tmp/fincheck-bench
+#   python -m benchmarks.run_suite --compare benchmarks/results/baseline.json --threshold 0.1
+#
+# Caches are cleared before every timed call, so numbers are for real work,
+# not cache hits. Peak RSS is per case where /proc/self/clear_refs allows
+# resetting it, otherwise the process peak so far.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_llm import FakeLLMServer, add_arguments, settings_from_args
+
+SHAPES = {"narrow": 9, "wide": 300}
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's high-water mark (VmHWM) for this process; Linux only"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def measure(name: str, params: dict, func: Callable, args, setup: Optional[Callable] = None,
+            rows: int = 0, size_bytes: int = 0, min_iterations: int = 3, min_seconds: float = 1.0,
+            max_iterations: int = 1000) -> dict:
+    """Call func until min_iterations and min_seconds are both reached; setup runs untimed before each call"""
+    if setup:
+        setup()
+    func(*args)
+    rss_per_case = reset_peak_rss()
+    
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_iterations and (len(timings) < min_iterations or time.perf_counter() - started < min_seconds):
+        if setup:
+            setup()
+        call_started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - call_started)
+    
+    seconds = np.array(timings)
+    ops_per_s = len(seconds) / seconds.sum()
+    throughput = {"ops_per_s": round(ops_per_s, 2)}
+    if rows:
+        throughput["rows_per_s"] = round(ops_per_s * rows)
+    if size_bytes:
+        throughput["mb_per_s"] = round(ops_per_s * size_bytes / 1024 / 1024, 2)
+    
+    p50, p95, p99 = np.percentile(seconds * 1000, [50, 95, 99])
+    return {
+        "name": name,
+        "params": params,
+        "iterations": len(seconds),
+        "latency_ms": {
+            "mean": round(float(seconds.mean() * 1000), 3),
+            "min": round(float(seconds.min() * 1000), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(seconds.max() * 1000), 3)
+        },
+        "throughput": throughput,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_scope": "case" if rss_per_case else "process"
+    }
+
+def run_cases(args, llm: FakeLLMServer) -> List[dict]:
+    # App modules read config at import, so they are imported only once main() has set the environment
+    import pandas as pd
+    from fastapi.testclient import TestClient
+    
+    from benchmarks.synthetic import load_file_bytes, make_financial_frame
+    from column_matcher import detect_cached
+    from main import app
+    from routes.analysis import analysis_cache
+    from routes.insights import insights_cache
+    from routes.upload import detect_columns, validate_and_process_file
+    
+    timing = {"min_iterations": args.min_iterations, "min_seconds": args.min_seconds}
+    results = []
+    
+    def record(result: dict):
+        latency = result["latency_ms"]
+        label = " ".join(f"{key}={value}" for key, value in result["params"].items())
+        print(
+            f"{result['name']:<28}{label:<40}{latency['p50']:>12.3f}{latency['p95']:>12.3f}"
+            f"{result['throughput']['ops_per_s']:>12.2f}{result['peak_rss_mb']:>10.1f}",
+            file=sys.stderr
+        )
+        results.append(result)
+    
+    print(f"{'case':<28}{'params':<40}{'p50 ms':>12}{'p95 ms':>12}{'ops/s':>12}{'RSS MB':>10}", file=sys.stderr)
+    
+    for shape in args.shapes:
+        headers = make_financial_frame(1, SHAPES[shape] - 9).columns.tolist()
+        header_frame = pd.DataFrame(columns=headers)
+        record(measure("detect_columns", {"shape": shape, "columns": len(headers)}, detect_columns, (header_frame,),
+                       setup=detect_cached.cache_clear, **timing))
+    
+    for rows in args.rows:
+        for shape in args.shapes:
+            for fmt in args.formats:
+                if shape == "wide" and rows > args.max_wide_rows:
+                    print(f"skipping {fmt} {shape} {rows} rows (raise --max-wide-rows)", file=sys.stderr)
+                    continue
+                if fmt == "xlsx" and rows * SHAPES[shape] > args.max_xlsx_cells:
+                    print(f"skipping {fmt} {shape} {rows} rows (raise --max-xlsx-cells)", file=sys.stderr)
+                    continue
+                content = load_file_bytes(rows, SHAPES[shape] - 9, fmt, args.cache_dir)
+                params = {"rows": rows, "shape": shape, "format": fmt, "mb": round(len(content) / 1024 / 1024, 2)}
+                record(measure("validate_and_process_file", params, validate_and_process_file, (content, f"bench.{fmt}"),
+                               rows=rows, size_bytes=len(content), **timing))
+    
+    with TestClient(app) as client:
+        def calculate(body: str) -> dict:
+            response = client.post("/api/analysis/calculate", content=body, headers={"Content-Type": "application/json"})
+            response.raise_for_status()
+            return response.json()
+        
+        analysis = None
+        for rows in args.rows:
+            financial_data = validate_and_process_file(load_file_bytes(rows, 0, "csv", args.cache_dir), "bench.csv")["financial_data"]
+            body = json.dumps({"financial_data": {field: values.tolist() for field, values in financial_data.items()}})
+            analysis = analysis or calculate(body)
+            record(measure("calculate_financial_health", {"rows": rows}, calculate, (body,), setup=analysis_cache.clear,
+                           rows=rows, size_bytes=len(body), **timing))
+        
+        def compare(body: dict):
+            client.post("/api/benchmarks/compare", json=body).raise_for_status()
+        
+        record(measure("compare_with_benchmark", {"industry": "services"}, compare,
+                       ({"industry": "services", "analysis_data": analysis},), **timing))
+        
+        def generate(body: dict):
+            client.post("/api/insights/generate", json=body).raise_for_status()
+        
+        llm_params = {"first_token_ms": args.first_token_ms, "token_ms": args.token_ms, "tokens": args.tokens}
+        record(measure("generate_insights", llm_params, generate, ({"analysis_data": analysis, "industry": "services"},),
+                       setup=insights_cache.clear, **timing))
+    
+    return results
+
+def case_key(result: dict) -> str:
+    return result["name"] + json.dumps({key: value for key, value in result["params"].items() if key != "mb"}, sort_keys=True)
+
+def compare_results(results: List[dict], baseline: dict, threshold: float) -> List[str]:
+    """Print p50 changes against a previous run; returns the cases slower than threshold allows"""
+    previous = {case_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'case':<68}{'base p50':>12}{'p50':>12}{'change':>10}", file=sys.stderr)
+    for result in results:
+        before = previous.get(case_key(result))
+        if not before:
+            continue
+        old, new = before["latency_ms"]["p50"], result["latency_ms"]["p50"]
+        change = (new - old) / old if old else 0.0
+        label = case_key(result)
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{label[:67]:<68}{old:>12.3f}{new:>12.3f}{change:>+10.1%}{flag}", file=sys.stderr)
+        if flag:
+            regressions.append(label)
+    return regressions
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, scoring, benchmarking and insights")
+    parser.add_argument("--rows", default="12,1000,100000", help="Comma-separated file sizes in rows, e.g. 12,1000000")
+    parser.add_argument("--shapes", default="narrow,wide", help=f"Comma-separated from {', '.join(SHAPES)}")
+    parser.add_argument("--formats", default="csv,xlsx", help="Comma-separated from csv, xlsx")
+    # openpyxl reads and writes roughly 100k cells a second, so large workbooks take minutes each
+    parser.add_argument("--max-xlsx-cells", type=int, default=1_000_000, help="Skip XLSX files with more rows x columns")
+    parser.add_argument("--max-wide-rows", type=int, default=100_000, help="Skip larger wide files")
+    parser.add_argument("--min-iterations", type=int, default=3)
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="Keep repeating a case for at least this long")
+    parser.add_argument("--cache-dir", default="", help="Keep generated files here between runs")
+    parser.add_argument("--output", "-o", default="", help="Results file (default benchmarks/results/suite-<time>.json)")
+    parser.add_argument("--compare", default="", help="Previous results file to compare p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="p50 slowdown that counts as a regression")
+    add_arguments(parser)
+    args = parser.parse_args()
+    args.rows = [int(value) for value in args.rows.split(",")]
+    args.shapes = args.shapes.split(",")
+    args.formats = args.formats.split(",")
+    
+    with FakeLLMServer(settings_from_args(args)) as llm:
+        os.environ.update({
+            "GROQ_API_KEY": "benchmark",
+            "GROQ_BASE_URL": llm.base_url,
+            "HISTORY_DB_PATH": "",
+            "UPLOAD_CACHE_DB": "",
+            "ANALYSIS_CACHE_DB": "",
+            "INSIGHTS_CACHE_DB": ""
+        })
+        results = run_cases(args, llm)
+    
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"suite-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nResults written to {output}", file=sys.stderr)
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
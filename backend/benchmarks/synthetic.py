@@ -0,0 +1,64 @@
+# Synthetic financial files for benchmarks
+# Produces period-by-period ledgers with the column names detect_columns
+# expects, optionally padded with filler columns to mimic wide exports.
+
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+FINANCIAL_COLUMNS = {
+    "revenue": "Revenue",
+    "expenses": "Expenses",
+    "cash_inflow": "Cash Inflow",
+    "cash_outflow": "Cash Outflow",
+    "receivables": "Receivables",
+    "payables": "Payables",
+    "loans": "Loans",
+    "emi": "EMI"
+}
+
+def make_financial_frame(rows: int, extra_columns: int = 0, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    revenue = rng.normal(1_000_000, 150_000, rows).round(2)
+    expenses = (revenue * rng.uniform(0.6, 0.95, rows)).round(2)
+    cash_inflow = (revenue * rng.uniform(0.85, 1.05, rows)).round(2)
+    
+    columns = {
+        "Period": np.arange(1, rows + 1),
+        FINANCIAL_COLUMNS["revenue"]: revenue,
+        FINANCIAL_COLUMNS["expenses"]: expenses,
+        FINANCIAL_COLUMNS["cash_inflow"]: cash_inflow,
+        FINANCIAL_COLUMNS["cash_outflow"]: (expenses * rng.uniform(0.9, 1.1, rows)).round(2),
+        FINANCIAL_COLUMNS["receivables"]: rng.normal(300_000, 50_000, rows).round(2),
+        FINANCIAL_COLUMNS["payables"]: rng.normal(250_000, 40_000, rows).round(2),
+        FINANCIAL_COLUMNS["loans"]: rng.normal(2_000_000, 100_000, rows).round(2),
+        FINANCIAL_COLUMNS["emi"]: rng.normal(60_000, 5_000, rows).round(2)
+    }
+    # Filler names avoid every alias substring so they never shadow real columns
+    for i in range(extra_columns):
+        columns[f"col_{i:03d}"] = rng.integers(0, 10_000, rows)
+    
+    return pd.DataFrame(columns)
+
+def to_file_bytes(df: pd.DataFrame, fmt: str = "csv") -> bytes:
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+def load_file_bytes(rows: int, extra_columns: int = 0, fmt: str = "csv", cache_dir: str = "") -> bytes:
+    """to_file_bytes(make_financial_frame(...)), kept in cache_dir between runs when given"""
+    path = os.path.join(cache_dir, f"bench_{rows}_{extra_columns}.{fmt}") if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    
+    content = to_file_bytes(make_financial_frame(rows, extra_columns), fmt)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    return content
@@ -0,0 +1,153 @@
+# Result caching
+# Bounded in-memory LRU with per-entry TTL, optionally backed by a SQLite
+# file so entries survive restarts and can be shared between uvicorn
+# workers on the same host. Values must be JSON-serializable. Async
+# callers use get_async/set_async so SQLite I/O stays off the event loop.
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+def make_key(*parts: Any) -> str:
+    """Canonical SHA-256 of the given JSON-serializable parts"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    def __init__(self, namespace: str, max_entries: int = 256, ttl_seconds: float = 3600,
+                 db_path: Optional[str] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "value TEXT NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_memory(self, key: str, now: float) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[Any]:
+        row = self._db().execute(
+            "SELECT expires_at, value FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row and row[0] > now:
+            value = json.loads(row[1])
+            self._remember(key, value, row[0])
+            with self._lock:
+                self.disk_hits += 1
+            return value
+        return None
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _store(self, key: str, value: Any, expires_at: float):
+        conn = self._db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, expires_at, json.dumps(value, separators=(",", ":")))
+            )
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time())
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self.db_path:
+            value = self._get_disk(key, now)
+        if value is None:
+            self._miss()
+        return value
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """get for event loop callers; only the SQLite tier goes through the threadpool"""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self.db_path:
+            value = await run_in_threadpool(self._get_disk, key, now)
+        if value is None:
+            self._miss()
+        return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        if self.db_path:
+            self._store(key, value, expires_at)
+
+    async def set_async(self, key: str, value: Any):
+        """set for event loop callers; the SQLite write runs in the threadpool"""
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        if self.db_path:
+            await run_in_threadpool(self._store, key, value, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            conn = self._db()
+            with conn:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_tier": bool(self.db_path),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,154 @@
+# Financial column detection
+# Every alias is compiled into one Aho-Corasick automaton, so each header
+# is scanned once regardless of how many fields or aliases are registered.
+# A field matches a header when any of its aliases occurs in the normalized
+# header (lowercased, spaces to underscores); the first matching column per
+# field wins. Operators can add aliases - e.g. Hindi column names - via a
+# JSON file named by COLUMN_ALIASES_FILE, or register_aliases() at startup.
+
+import json
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+from cache import make_key
+from config import COLUMN_ALIASES_FILE
+
+EXPECTED_COLUMNS = {
+    "revenue": ["revenue", "sales", "income", "total_revenue", "gross_revenue"],
+    "expenses": ["expenses", "costs", "expenditure", "total_expenses", "operating_expenses"],
+    "cash_inflow": ["cash_inflow", "cash_in", "receipts", "collections", "inflow"],
+    "cash_outflow": ["cash_outflow", "cash_out", "payments", "disbursements", "outflow"],
+    "receivables": ["receivables", "accounts_receivable", "ar", "debtors", "trade_receivables"],
+    "payables": ["payables", "accounts_payable", "ap", "creditors", "trade_payables"],
+    "loans": ["loans", "debt", "borrowings", "loan_balance", "outstanding_loans"],
+    "emi": ["emi", "loan_payment", "installment", "monthly_payment", "repayment"]
+}
+
+def normalize_header(name: Hashable) -> str:
+    return str(name).lower().replace(" ", "_")
+
+class AliasMatcher:
+    """Aho-Corasick automaton reporting which fields' aliases occur in a header"""
+    
+    def __init__(self, aliases: Dict[str, List[str]]):
+        self.fields = list(aliases)
+        self.signature = make_key("column-aliases", aliases)
+        
+        # Trie of aliases; outputs[state] is a bitmask of the fields ending there
+        self.goto: List[Dict[str, int]] = [{}]
+        self.outputs = [0]
+        for bit, field in enumerate(self.fields):
+            for alias in aliases[field]:
+                state = 0
+                for char in alias:
+                    next_state = self.goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self.goto)
+                        self.goto[state][char] = next_state
+                        self.goto.append({})
+                        self.outputs.append(0)
+                    state = next_state
+                self.outputs[state] |= 1 << bit
+        
+        # Failure links, breadth first, folding each suffix's outputs into its state
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] |= self.outputs[self.fail[next_state]]
+    
+    def match(self, header: str) -> int:
+        """Bitmask of the fields with an alias somewhere in the normalized header"""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        state = found = 0
+        for char in header:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found |= outputs[state]
+        return found
+    
+    def detect(self, headers: Iterable[Hashable]) -> Dict[str, Hashable]:
+        """Map each field to the first header matching one of its aliases"""
+        matches = {}
+        remaining = (1 << len(self.fields)) - 1
+        for header in headers:
+            found = self.match(normalize_header(header)) & remaining
+            if not found:
+                continue
+            for bit, field in enumerate(self.fields):
+                if found >> bit & 1:
+                    matches[field] = header
+            remaining &= ~found
+            if not remaining:
+                break
+        return {field: matches[field] for field in self.fields if field in matches}
+
+@lru_cache(maxsize=256)
+def detect_cached(matcher: AliasMatcher, headers: Tuple[Hashable, ...]) -> Dict[str, Hashable]:
+    return matcher.detect(headers)
+
+class AliasRegistry:
+    """Alias lists per financial field; changes rebuild the matcher"""
+    
+    def __init__(self, aliases: Dict[str, List[str]]):
+        self._aliases = {field: [normalize_header(alias) for alias in values] for field, values in aliases.items()}
+        self._lock = threading.Lock()
+        self.matcher = AliasMatcher(self._aliases)
+    
+    @property
+    def signature(self) -> str:
+        """Digest of the current aliases; changes whenever detection could"""
+        return self.matcher.signature
+    
+    def aliases(self) -> Dict[str, List[str]]:
+        return {field: list(values) for field, values in self._aliases.items()}
+    
+    def register(self, field: str, aliases: Iterable[str]):
+        if field not in self._aliases:
+            raise ValueError(f"Unknown financial field '{field}'. Use one of: {', '.join(self._aliases)}.")
+        
+        with self._lock:
+            added = False
+            for alias in aliases:
+                alias = normalize_header(alias)
+                if alias and alias not in self._aliases[field]:
+                    self._aliases[field].append(alias)
+                    added = True
+            if added:
+                self.matcher = AliasMatcher(self._aliases)
+                detect_cached.cache_clear()
+    
+    def detect(self, headers: Iterable[Hashable]) -> Dict[str, Hashable]:
+        """Detected columns, cached per header signature"""
+        headers = tuple(headers)
+        try:
+            return dict(detect_cached(self.matcher, headers))
+        except TypeError:
+            # Unhashable header labels; match without the cache
+            return self.matcher.detect(headers)
+
+alias_registry = AliasRegistry(EXPECTED_COLUMNS)
+
+def register_aliases(field: str, aliases: Iterable[str]):
+    alias_registry.register(field, aliases)
+
+def load_alias_file(path: str):
+    """Register aliases from a JSON object of field -> list of aliases"""
+    with open(path, encoding="utf-8") as f:
+        extra = json.load(f)
+    if not isinstance(extra, dict):
+        raise ValueError(f"{path} must contain a JSON object of field -> aliases")
+    for field, aliases in extra.items():
+        register_aliases(field, [aliases] if isinstance(aliases, str) else aliases)
+
+if COLUMN_ALIASES_FILE:
+    load_alias_file(COLUMN_ALIASES_FILE)
@@ -0,0 +1,80 @@
+# Compact columnar encoding for financial series
+# Series travel as little-endian float64 buffers instead of JSON number
+# lists. "columnar" wraps each buffer in base64 so it can sit inside a JSON
+# body and be read client-side with a Float64Array; "arrow" packs all series
+# into one Arrow IPC stream when pyarrow is installed.
+
+import base64
+import hashlib
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+FORMATS = ("json", "columnar", "arrow")
+
+def to_float_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype="<f8")
+
+def series_digest(financial_data: Dict[str, Optional[Sequence[float]]]) -> str:
+    """SHA-256 over the float64 bytes of each non-empty series, in field order"""
+    digest = hashlib.sha256()
+    for field in sorted(financial_data):
+        values = financial_data[field]
+        if values is None or len(values) == 0:
+            continue
+        array = to_float_array(values)
+        digest.update(f"{field}:{array.size}:".encode("ascii"))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+def encode_series(values) -> dict:
+    array = to_float_array(values)
+    return {
+        "dtype": "float64",
+        "byteorder": "little",
+        "length": int(array.size),
+        "data": base64.b64encode(array.tobytes()).decode("ascii")
+    }
+
+def decode_series(encoded: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded["data"]), dtype="<f8")
+
+def encode_arrow(financial_data: Dict[str, np.ndarray]) -> dict:
+    if pa is None:
+        raise ValueError("Arrow encoding requires pyarrow to be installed.")
+    
+    # Series can differ in length after non-numeric cells are dropped, so
+    # shorter columns are null-padded to the longest one
+    length = max((len(values) for values in financial_data.values()), default=0)
+    columns = {}
+    for field, values in financial_data.items():
+        array = to_float_array(values)
+        mask = np.zeros(length, dtype=bool)
+        mask[array.size:] = True
+        padded = np.zeros(length, dtype="<f8")
+        padded[:array.size] = array
+        columns[field] = pa.array(padded, mask=mask)
+    
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    
+    return {
+        "encoding": "arrow-ipc",
+        "lengths": {field: int(len(values)) for field, values in financial_data.items()},
+        "data": base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii")
+    }
+
+def encode_financial_data(financial_data: Dict[str, np.ndarray], fmt: str = "json"):
+    """Encode parsed series for a response body in the requested format"""
+    if fmt == "columnar":
+        return {field: encode_series(values) for field, values in financial_data.items()}
+    if fmt == "arrow":
+        return encode_arrow(financial_data)
+    return {field: to_float_array(values).tolist() for field, values in financial_data.items()}
@@ -2,7 +2,72 @@ import os
 
 # Groq API Configuration (OpenAI-compatible)
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
-GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+
+# LLM client pooling and concurrency limits
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+
+# Insights cache - set INSIGHTS_CACHE_DB to a file path to persist across restarts
+INSIGHTS_CACHE_MAX_ENTRIES = int(os.environ.get("INSIGHTS_CACHE_MAX_ENTRIES", "512"))
+INSIGHTS_CACHE_TTL_SECONDS = float(os.environ.get("INSIGHTS_CACHE_TTL_SECONDS", "86400"))
+INSIGHTS_CACHE_DB = os.environ.get("INSIGHTS_CACHE_DB", "")
+
+# Analysis results memoized on the series digest - set ANALYSIS_CACHE_DB to share between workers
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
+ANALYSIS_CACHE_TTL_SECONDS = float(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+ANALYSIS_CACHE_DB = os.environ.get("ANALYSIS_CACHE_DB", "")
+
+# Industry benchmark distributions - re-read when the file changes, checked at most every interval
+BENCHMARK_DISTRIBUTIONS_FILE = os.environ.get(
+    "BENCHMARK_DISTRIBUTIONS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "benchmark_distributions.json")
+)
+BENCHMARK_RELOAD_INTERVAL_SECONDS = float(os.environ.get("BENCHMARK_RELOAD_INTERVAL_SECONDS", "5"))
+# Written by benchmark_aggregator.py and preferred over the built-in file above once it exists
+# Anchored to this directory, like the built-in file, so the job and the server agree whatever their cwd
+BENCHMARK_PUBLISHED_FILE = os.environ.get(
+    "BENCHMARK_PUBLISHED_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fincheck_benchmarks.json")
+)
+
+# Upload size limit and streaming ingestion
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "10"))
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", "100000"))
+
+# Parsed-upload cache keyed on file content - set UPLOAD_CACHE_DB to persist across restarts
+UPLOAD_CACHE_MAX_ENTRIES = int(os.environ.get("UPLOAD_CACHE_MAX_ENTRIES", "64"))
+UPLOAD_CACHE_TTL_SECONDS = float(os.environ.get("UPLOAD_CACHE_TTL_SECONDS", "86400"))
+UPLOAD_CACHE_DB = os.environ.get("UPLOAD_CACHE_DB", "")
+
+# Extra column aliases (e.g. Hindi headers) - JSON object of field -> list of aliases
+COLUMN_ALIASES_FILE = os.environ.get("COLUMN_ALIASES_FILE", "")
+
+# Upload parsing worker pool
+PARSE_MAX_WORKERS = int(os.environ.get("PARSE_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARSE_MAX_PENDING = int(os.environ.get("PARSE_MAX_PENDING", "16"))
+PARSE_TIMEOUT_SECONDS = float(os.environ.get("PARSE_TIMEOUT_SECONDS", "60"))
+
+# Upload and analysis history (also backs incremental analysis and benchmark aggregation) - off
+# unless HISTORY_DB_PATH is set. Authentication is disabled, so every visitor is the same demo
+# user and would see everyone else's uploads; only enable it for single-tenant deployments.
+HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH", "")
+
+# Request timing middleware, code-section spans and the /api/metrics endpoint
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Opt-in request profiling - sampled requests or "X-Profile: 1"; stays off unless PROFILING_ADMIN_TOKEN is set too
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_MS = float(os.environ.get("PROFILING_INTERVAL_MS", "5"))
+PROFILING_MAX_ACTIVE = int(os.environ.get("PROFILING_MAX_ACTIVE", "4"))
+PROFILING_MAX_PROFILES = int(os.environ.get("PROFILING_MAX_PROFILES", "50"))
+PROFILING_ADMIN_TOKEN = os.environ.get("PROFILING_ADMIN_TOKEN", "")
+
+# Frontend build files up to this size are served from memory; larger ones stream from disk
+STATIC_MEMORY_MAX_BYTES = int(os.environ.get("STATIC_MEMORY_MAX_BYTES", str(4 * 1024 * 1024)))
 
 # Supabase has been removed - authentication is disabled
 supabase = None
@@ -0,0 +1,297 @@
+# Upload and analysis history
+# Embedded SQLite store (WAL mode) for processed uploads and analysis
+# results. Upload series are stored column by column as raw float64
+# buffers, so a past upload can be re-scored without re-parsing. History
+# listings page by (created_at, id) keyset rather than OFFSET, so every
+# page is an index range scan no matter how deep it is. Incremental
+# analysis keeps each business's running aggregates here, plus its raw
+# cash inflows for the rare exact variance recompute. Analyses tagged with
+# an industry feed the benchmark aggregation job, which keeps its
+# checkpoint in benchmark_state.
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from columnar import to_float_array
+from config import HISTORY_DB_PATH
+from incremental import RunningAggregates
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    filename TEXT NOT NULL,
+    total_rows INTEGER NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_user_created ON uploads (user_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS upload_series (
+    upload_id INTEGER NOT NULL REFERENCES uploads (id) ON DELETE CASCADE,
+    field TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (upload_id, field)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    upload_id INTEGER,
+    data_hash TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    grade TEXT NOT NULL,
+    overall_health TEXT NOT NULL,
+    result TEXT NOT NULL,
+    industry TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_user_created ON analyses (user_id, created_at, id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analyses_user_hash ON analyses (user_id, data_hash);
+
+CREATE TABLE IF NOT EXISTS business_aggregates (
+    user_id TEXT NOT NULL,
+    business_id TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (user_id, business_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS business_inflows (
+    user_id TEXT NOT NULL,
+    business_id TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (user_id, business_id, period)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS benchmark_state (
+    name TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+# Columns added after a table first shipped, applied to databases created before them
+MIGRATIONS = [
+    ("analyses", "industry", "ALTER TABLE analyses ADD COLUMN industry TEXT")
+]
+
+def encode_cursor(created_at: float, row_id: int) -> str:
+    return f"{created_at!r}_{row_id}"
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        created_at, row_id = cursor.rsplit("_", 1)
+        return float(created_at), int(row_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+class HistoryStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    for table, column, statement in MIGRATIONS:
+                        if column not in {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                            conn.execute(statement)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _page(self, table: str, columns: str, user_id: str, limit: int, cursor: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+        query = f"SELECT {columns} FROM {table} WHERE user_id = ?"
+        params: list = [user_id]
+        if cursor:
+            query += " AND (created_at, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._db().execute(query, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return [dict(row) for row in rows], next_cursor
+
+    def save_upload(self, user_id: str, filename: str, summary: dict, financial_data: Dict[str, np.ndarray]) -> int:
+        conn = self._db()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO uploads (user_id, created_at, filename, total_rows, summary) VALUES (?, ?, ?, ?, ?)",
+                (user_id, time.time(), filename, summary["total_rows"], json.dumps(summary))
+            )
+            upload_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO upload_series (upload_id, field, data) VALUES (?, ?, ?)",
+                [(upload_id, field, to_float_array(values).tobytes()) for field, values in financial_data.items()]
+            )
+        return upload_id
+
+    def list_uploads(self, user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        return self._page("uploads", "id, created_at, filename, total_rows", user_id, limit, cursor)
+
+    def get_upload(self, user_id: str, upload_id: int) -> Optional[dict]:
+        conn = self._db()
+        row = conn.execute(
+            "SELECT id, created_at, filename, summary FROM uploads WHERE id = ? AND user_id = ?",
+            (upload_id, user_id)
+        ).fetchone()
+        if row is None:
+            return None
+
+        series = conn.execute("SELECT field, data FROM upload_series WHERE upload_id = ?", (upload_id,)).fetchall()
+        return {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "filename": row["filename"],
+            "summary": json.loads(row["summary"]),
+            "financial_data": {field: np.frombuffer(data, dtype="<f8") for field, data in series}
+        }
+
+    def save_analysis(self, user_id: str, data_hash: str, result: dict, upload_id: Optional[int] = None,
+                      industry: Optional[str] = None) -> int:
+        """Record an analysis; re-scoring identical data returns the existing id, linking it to
+        upload_id when given and tagging it with industry if it has none yet"""
+        conn = self._db()
+        with conn:
+            # The first industry tag sticks, since the benchmark job may already have counted it
+            conn.execute(
+                "INSERT INTO analyses "
+                "(user_id, created_at, upload_id, data_hash, score, grade, overall_health, result, industry) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, data_hash) DO UPDATE SET "
+                "upload_id = COALESCE(excluded.upload_id, upload_id), "
+                "industry = COALESCE(industry, excluded.industry)",
+                (
+                    user_id, time.time(), upload_id, data_hash,
+                    result["creditworthiness"]["score"], result["creditworthiness"]["grade"],
+                    result["overall_health"], json.dumps(result), industry
+                )
+            )
+        row = conn.execute(
+            "SELECT id FROM analyses WHERE user_id = ? AND data_hash = ?", (user_id, data_hash)
+        ).fetchone()
+        return row["id"]
+
+    def list_analyses(self, user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        return self._page("analyses", "id, created_at, upload_id, score, grade, overall_health", user_id, limit, cursor)
+
+    def get_analysis(self, user_id: str, analysis_id: int) -> Optional[dict]:
+        row = self._db().execute(
+            "SELECT id, created_at, upload_id, result FROM analyses WHERE id = ? AND user_id = ?",
+            (analysis_id, user_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "upload_id": row["upload_id"],
+            "analysis": json.loads(row["result"])
+        }
+
+    def append_business_periods(self, user_id: str, business_id: str,
+                                financial_data: Dict[str, Optional[List[float]]]) -> RunningAggregates:
+        """Fold new periods into a business's running aggregates, creating it on first use"""
+        conn = self._db()
+        with conn:
+            # Take the write lock before reading so concurrent appends serialize
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT state FROM business_aggregates WHERE user_id = ? AND business_id = ?",
+                (user_id, business_id)
+            ).fetchone()
+            aggregates = RunningAggregates.from_state(json.loads(row["state"])) if row else RunningAggregates()
+            
+            first_period = aggregates.sums["cash_inflow"].count
+            aggregates.append(financial_data)
+            conn.executemany(
+                "INSERT INTO business_inflows (user_id, business_id, period, value) VALUES (?, ?, ?, ?)",
+                [
+                    (user_id, business_id, first_period + i, float(value))
+                    for i, value in enumerate(financial_data.get("cash_inflow") or [])
+                ]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO business_aggregates (user_id, business_id, updated_at, state) VALUES (?, ?, ?, ?)",
+                (user_id, business_id, time.time(), json.dumps(aggregates.to_state()))
+            )
+        return aggregates
+
+    def get_business_aggregates(self, user_id: str, business_id: str) -> Optional[RunningAggregates]:
+        row = self._db().execute(
+            "SELECT state FROM business_aggregates WHERE user_id = ? AND business_id = ?",
+            (user_id, business_id)
+        ).fetchone()
+        return RunningAggregates.from_state(json.loads(row["state"])) if row else None
+
+    def get_business_inflows(self, user_id: str, business_id: str) -> np.ndarray:
+        rows = self._db().execute(
+            "SELECT value FROM business_inflows WHERE user_id = ? AND business_id = ? ORDER BY period",
+            (user_id, business_id)
+        ).fetchall()
+        # SQLite stores NaN as NULL, which NumPy turns back into NaN
+        return np.array([row["value"] for row in rows], dtype=np.float64)
+
+    def delete_business(self, user_id: str, business_id: str) -> bool:
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM business_inflows WHERE user_id = ? AND business_id = ?", (user_id, business_id))
+            cursor = conn.execute(
+                "DELETE FROM business_aggregates WHERE user_id = ? AND business_id = ?", (user_id, business_id)
+            )
+        return cursor.rowcount > 0
+
+    def iter_industry_analyses(self, after_id: int, batch_size: int = 1000):
+        """(id, industry, result) for analyses tagged with an industry, in id order after after_id"""
+        while True:
+            rows = self._db().execute(
+                "SELECT id, industry, result FROM analyses WHERE id > ? AND industry IS NOT NULL ORDER BY id LIMIT ?",
+                (after_id, batch_size)
+            ).fetchall()
+            for row in rows:
+                yield row["id"], row["industry"], json.loads(row["result"])
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]["id"]
+
+    def get_benchmark_state(self, name: str) -> Optional[dict]:
+        row = self._db().execute("SELECT state FROM benchmark_state WHERE name = ?", (name,)).fetchone()
+        return json.loads(row["state"]) if row else None
+
+    def save_benchmark_state(self, name: str, state: dict):
+        conn = self._db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO benchmark_state (name, updated_at, state) VALUES (?, ?, ?)",
+                (name, time.time(), json.dumps(state))
+            )
+
+history_store: Optional[HistoryStore] = None
+
+def get_history_store() -> Optional[HistoryStore]:
+    """Shared store, or None when HISTORY_DB_PATH is empty"""
+    global history_store
+    if history_store is None and HISTORY_DB_PATH:
+        history_store = HistoryStore(HISTORY_DB_PATH)
+    return history_store
@@ -0,0 +1,108 @@
+# HTTP conditional responses
+# Strong ETags derived from content digests, and If-None-Match handling so
+# a client revalidating an unchanged result gets a bodiless 304.
+# PrecompressedBody/PrecompressedJSON encode and compress a body once, so
+# repeat hits on static-ish endpoints only negotiate an encoding and send
+# bytes.
+
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from cache import make_key
+
+def make_etag(*parts: Any) -> str:
+    return f'"{make_key(*parts)[:32]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check, using weak comparison as RFC 9110 requires"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def accepted_encodings(request: Request) -> Dict[str, float]:
+    """Accept-Encoding as coding -> q-value"""
+    encodings = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        encodings[coding.strip().lower()] = q
+    return encodings
+
+def negotiate_encoding(request: Request, available) -> str:
+    """Best of br, gzip and identity that both sides support"""
+    accepted = accepted_encodings(request)
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return "identity"
+
+def encoding_etags(digest: str, encodings) -> Dict[str, str]:
+    # Each encoding is a distinct representation, so each gets its own strong ETag
+    return {
+        encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+        for encoding in encodings
+    }
+
+class PrecompressedBody:
+    """A body encoded once, with gzip (and brotli, when installed) variants and strong ETags"""
+
+    def __init__(self, identity: bytes, media_type: str, cache_control: str, variants: Optional[Dict[str, bytes]] = None,
+                 compress: bool = True, brotli_quality: int = 11):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.bodies = {"identity": identity, **(variants or {})}
+        if compress and "gzip" not in self.bodies:
+            self.bodies["gzip"] = gzip.compress(identity, compresslevel=9, mtime=0)
+        if compress and brotli is not None and "br" not in self.bodies:
+            self.bodies["br"] = brotli.compress(identity, quality=brotli_quality)
+        # A variant that is no smaller than the original is not worth sending
+        self.bodies = {
+            encoding: body for encoding, body in self.bodies.items()
+            if encoding == "identity" or len(body) < len(identity)
+        }
+        self.etags = encoding_etags(hashlib.sha256(identity).hexdigest()[:32], self.bodies)
+
+    def negotiate(self, request: Request) -> str:
+        return negotiate_encoding(request, self.bodies)
+
+    def respond(self, request: Request) -> Response:
+        encoding = self.negotiate(request)
+        headers = {"ETag": self.etags[encoding], "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        # Only the variant being served validates; a cached gzip body is no good to an identity-only client
+        if etag_matches(request, self.etags[encoding]):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], media_type=self.media_type, headers=headers)
+
+class PrecompressedJSON(PrecompressedBody):
+    """A JSON body serialized and compressed once"""
+
+    def __init__(self, content: Any, cache_control: str):
+        identity = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        super().__init__(identity, "application/json", cache_control)
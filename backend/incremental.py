@@ -0,0 +1,164 @@
+# Incremental scoring
+# Running per-business aggregates that absorb newly appended periods in
+# O(1) each and score exactly like score_financial_data over the full
+# history. Sums replay the float operations seq_sum performs, so totals are
+# bit-identical. Inflow variance is tracked with Welford's method; its
+# rounding differs from the two-pass variance, so when that difference
+# could move the cash flow score across an integer the stored inflow
+# series is rescored exactly instead. Periods of whichever series runs
+# ahead wait in a queue for their counterpart; appends that would leave
+# the series more than MAX_UNPAIRED_PERIODS apart are rejected.
+
+import math
+import sys
+from collections import deque
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from scoring import SERIES_FIELDS, inflow_variance, near_score_boundary, score_aggregates, score_cash_flow_stability
+
+EPSILON = sys.float_info.epsilon
+
+# How far one of cash_inflow / cash_outflow may run ahead of the other
+MAX_UNPAIRED_PERIODS = 1200
+
+class RunningSum:
+    """seq_sum over values seen so far, updated one value at a time"""
+
+    def __init__(self, partial: float = 0.0, compensation: float = 0.0, count: int = 0):
+        self.partial = partial
+        self.compensation = compensation
+        self.count = count
+
+    def add(self, value: float):
+        if not self.count:
+            # sum() starts from the int 0, which turns a leading -0.0 into 0.0
+            self.partial = 0 + value
+        elif sys.version_info >= (3, 12):
+            # Builtin sum()'s Neumaier compensation, step for step
+            total = self.partial + value
+            if abs(self.partial) >= abs(value):
+                self.compensation += (self.partial - total) + value
+            else:
+                self.compensation += (value - total) + self.partial
+            self.partial = total
+        else:
+            self.partial += value
+        self.count += 1
+
+    @property
+    def value(self) -> float:
+        if not self.count:
+            return 0
+        if self.compensation and math.isfinite(self.compensation):
+            return self.partial + self.compensation
+        return self.partial
+
+class RunningAggregates:
+    """Everything score_aggregates needs for one business, kept current as periods arrive"""
+
+    def __init__(self):
+        self.sums = {field: RunningSum() for field in SERIES_FIELDS}
+        self.positive_months = 0
+        # Values of whichever series is ahead, waiting for their same-period counterpart
+        self.unpaired_field: Optional[str] = None
+        self.unpaired: deque = deque()
+        # Welford running mean and sum of squared deviations of cash_inflow
+        self.inflow_mean = 0.0
+        self.inflow_m2 = 0.0
+
+    def counts(self) -> Dict[str, int]:
+        return {field: running.count for field, running in self.sums.items()}
+
+    def append(self, financial_data: Dict[str, Optional[Sequence[float]]]):
+        """Append new periods; each field's values follow on from its existing series.
+        Raises ValueError, leaving the aggregates untouched, if cash_inflow and
+        cash_outflow would end up more than MAX_UNPAIRED_PERIODS apart"""
+        counts = self.counts()
+        ahead = (
+            counts["cash_inflow"] + len(financial_data.get("cash_inflow") or [])
+            - counts["cash_outflow"] - len(financial_data.get("cash_outflow") or [])
+        )
+        if abs(ahead) > MAX_UNPAIRED_PERIODS:
+            raise ValueError(
+                f"cash_inflow and cash_outflow would be {abs(ahead)} periods apart; at most {MAX_UNPAIRED_PERIODS} allowed"
+            )
+        
+        for field in SERIES_FIELDS:
+            for value in financial_data.get(field) or []:
+                value = float(value)
+                self.sums[field].add(value)
+                if field == "cash_inflow":
+                    self._add_inflow(value)
+                elif field == "cash_outflow":
+                    self._pair(field, value)
+
+    def _add_inflow(self, value: float):
+        count = self.sums["cash_inflow"].count
+        delta = value - self.inflow_mean
+        self.inflow_mean += delta / count
+        self.inflow_m2 += delta * (value - self.inflow_mean)
+        self._pair("cash_inflow", value)
+
+    def _pair(self, field: str, value: float):
+        if not self.unpaired or self.unpaired_field == field:
+            self.unpaired_field = field
+            self.unpaired.append(value)
+            return
+        other = self.unpaired.popleft()
+        inflow, outflow = (value, other) if field == "cash_inflow" else (other, value)
+        self.positive_months += (inflow - outflow) > 0
+
+    def variance_settled(self, stability_ratio: float, avg_inflow: float, variance: float) -> bool:
+        """True when the exact two-pass variance is certain to give the same score"""
+        if avg_inflow <= 0:
+            return True
+        if not math.isfinite(variance) or near_score_boundary(stability_ratio, avg_inflow, variance):
+            return False
+        
+        # Generous bound on how far Welford and the two-pass variance can drift apart
+        count = self.sums["cash_inflow"].count
+        tolerance = 8 * (count + 2) * EPSILON * (variance + avg_inflow * avg_inflow)
+        low = score_cash_flow_stability(stability_ratio, (max(variance - tolerance, 0) ** 0.5) / avg_inflow)
+        high = score_cash_flow_stability(stability_ratio, ((variance + tolerance) ** 0.5) / avg_inflow)
+        return low["score"] == high["score"]
+
+    def score(self, load_inflows: Callable[[], np.ndarray]) -> dict:
+        """Score the business; load_inflows returns the full cash_inflow series,
+        needed only when the running variance is too close to call"""
+        counts = self.counts()
+        totals = {field: running.value for field, running in self.sums.items()}
+        positive_months, inflow_var = 0, 0.0
+        
+        if counts["cash_inflow"] and counts["cash_outflow"]:
+            periods = min(counts["cash_inflow"], counts["cash_outflow"])
+            positive_months = self.positive_months
+            avg_inflow = totals["cash_inflow"] / counts["cash_inflow"]
+            inflow_var = self.inflow_m2 / counts["cash_inflow"]
+            if not self.variance_settled(positive_months / periods, avg_inflow, inflow_var):
+                inflow_var = inflow_variance(load_inflows(), avg_inflow, positive_months / periods)
+        
+        return score_aggregates(counts, totals, positive_months, inflow_var)
+
+    def to_state(self) -> dict:
+        return {
+            "sums": {field: [running.partial, running.compensation, running.count] for field, running in self.sums.items()},
+            "positive_months": self.positive_months,
+            "unpaired_field": self.unpaired_field,
+            "unpaired": list(self.unpaired),
+            "inflow_mean": self.inflow_mean,
+            "inflow_m2": self.inflow_m2
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RunningAggregates":
+        aggregates = cls()
+        for field, (partial, compensation, count) in state["sums"].items():
+            aggregates.sums[field] = RunningSum(partial, compensation, count)
+        aggregates.positive_months = state["positive_months"]
+        aggregates.unpaired_field = state["unpaired_field"]
+        aggregates.unpaired = deque(state["unpaired"])
+        aggregates.inflow_mean = state["inflow_mean"]
+        aggregates.inflow_m2 = state["inflow_m2"]
+        return aggregates
@@ -0,0 +1,92 @@
+# Shared async LLM client
+# One pooled HTTP connection per worker, opened in main.py's lifespan and
+# closed on shutdown; using it outside the lifespan is an error rather
+# than a connection pool nobody closes. A semaphore caps how many completions run at once so
+# insight generation never starves the rest of the API.
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_CONCURRENCY,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+)
+from metrics import Span
+
+_http_client: Optional[httpx.AsyncClient] = None
+_client: Optional[AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+class LLMBusyError(Exception):
+    """Raised when no LLM slot frees up within the queue timeout"""
+
+def _create_client() -> Optional[AsyncOpenAI]:
+    global _http_client, _client
+    if not GROQ_API_KEY:
+        return None
+    _http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT_SECONDS, connect=10.0)
+    )
+    _client = AsyncOpenAI(
+        api_key=GROQ_API_KEY,
+        base_url=GROQ_BASE_URL,
+        http_client=_http_client
+    )
+    return _client
+
+async def startup():
+    """Open the pooled client - called from main.py's lifespan"""
+    global _semaphore
+    _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    if _client is None:
+        _create_client()
+
+async def shutdown():
+    """Close the pooled connection - called from main.py's lifespan"""
+    global _http_client, _client
+    if _client is not None:
+        await _client.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _client = None
+
+def is_configured() -> bool:
+    return bool(GROQ_API_KEY)
+
+def get_client() -> AsyncOpenAI:
+    """Return the shared client opened by startup()"""
+    if _client is None:
+        raise RuntimeError("LLM client is not open; it is only available inside the app lifespan")
+    return _client
+
+@asynccontextmanager
+async def llm_slot():
+    """Hold one of LLM_MAX_CONCURRENCY slots for the duration of a completion"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    try:
+        # wait_for can drop a permit acquired just as the timeout fires; asyncio.timeout cannot
+        with Span("llm_queue_wait"):
+            async with asyncio.timeout(LLM_QUEUE_TIMEOUT_SECONDS):
+                await _semaphore.acquire()
+    except TimeoutError:
+        raise LLMBusyError("AI service is busy. Please try again shortly.")
+    # Only reached once the permit is held, so release never runs for a failed acquire
+    try:
+        yield
+    finally:
+        _semaphore.release()
@@ -1,23 +1,38 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import os
 from pathlib import Path
 
+import llm_client
+import parse_pool
+from config import METRICS_ENABLED, PROFILING_ADMIN_TOKEN, PROFILING_ENABLED, STATIC_MEMORY_MAX_BYTES
+from metrics import MetricsMiddleware, monitor_event_loop, registry
+from profiling import ProfilingMiddleware
+from static_files import StaticSite
+
 from routes.auth import router as auth_router
 from routes.profile import router as profile_router
-from routes.upload import router as upload_router
-from routes.analysis import router as analysis_router
-from routes.insights import router as insights_router
+from routes.upload import router as upload_router, upload_cache, UploadLimitMiddleware
+from routes.analysis import router as analysis_router, analysis_cache
+from routes.insights import router as insights_router, insights_cache
 from routes.benchmarks import router as benchmarks_router
+from routes.pipeline import router as pipeline_router
+from routes.profiles import router as profiles_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("FINCHECK AI Backend Starting...")
+    await llm_client.startup()
+    lag_probe = asyncio.create_task(monitor_event_loop()) if METRICS_ENABLED else None
     yield
+    if lag_probe:
+        lag_probe.cancel()
+    await llm_client.shutdown()
+    parse_pool.shutdown()
     print("FINCHECK AI Backend Shutting Down...")
 
 app = FastAPI(
@@ -46,6 +61,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cap upload bodies while they stream in, before the multipart parser spools them
+app.add_middleware(UploadLimitMiddleware, paths=("/api/upload/file", "/api/pipeline/run"))
+
+# Not installed at all unless enabled, so unprofiled deployments pay nothing.
+# Profiles expose code paths, so profiling stays off without an admin token.
+profiling_active = PROFILING_ENABLED and bool(PROFILING_ADMIN_TOKEN)
+if PROFILING_ENABLED and not PROFILING_ADMIN_TOKEN:
+    print("PROFILING_ENABLED is set without PROFILING_ADMIN_TOKEN - profiling stays off")
+if profiling_active:
+    app.add_middleware(ProfilingMiddleware)
+
+# Added last so it is outermost, and request timings include every other middleware
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # API routes
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(profile_router, prefix="/api/profile", tags=["Profile"])
@@ -53,6 +83,28 @@ app.include_router(upload_router, prefix="/api/upload", tags=["File Upload"])
 app.include_router(analysis_router, prefix="/api/analysis", tags=["Financial Analysis"])
 app.include_router(insights_router, prefix="/api/insights", tags=["AI Insights"])
 app.include_router(benchmarks_router, prefix="/api/benchmarks", tags=["Industry Benchmarks"])
+app.include_router(pipeline_router, prefix="/api/pipeline", tags=["Pipeline"])
+if profiling_active:
+    app.include_router(profiles_router, prefix="/api/admin/profiles", tags=["Profiling"])
+
+def runtime_gauges() -> list:
+    """Values owned by other modules, read at scrape time"""
+    gauges = [("fincheck_parse_jobs_pending", "gauge", "Upload parse jobs queued or running", parse_pool.pending_jobs())]
+    for cache in (upload_cache, analysis_cache, insights_cache):
+        stats = cache.stats()
+        name = f"fincheck_{cache.namespace}_cache"
+        gauges.append((f"{name}_entries", "gauge", f"Entries in the {cache.namespace} cache", stats["entries"]))
+        for key in ("hits", "disk_hits", "misses", "evictions"):
+            gauges.append((f"{name}_{key}_total", "counter", f"{cache.namespace} cache {key.replace('_', ' ')}", stats[key]))
+    return gauges
+
+registry.collectors.append(runtime_gauges)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    if not METRICS_ENABLED:
+        return PlainTextResponse("Metrics are disabled\n", status_code=404)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/health")
 @app.head("/api/health")
@@ -66,41 +118,19 @@ STATIC_DIR = Path(__file__).parent.parent / "dist" / "public"
 if STATIC_DIR.exists():
     print(f"Serving static files from {STATIC_DIR}")
     
-    # Mount static assets (js, css, images)
-    assets_dir = STATIC_DIR / "assets"
-    if assets_dir.exists():
-        app.mount("/assets", StaticFiles(directory=str(assets_dir)), name="assets")
+    # Scanned once into memory; requests never touch the filesystem for small files
+    static_site = StaticSite(STATIC_DIR, STATIC_MEMORY_MAX_BYTES)
     
-    # Root route - serve index.html for both GET and HEAD
-    @app.get("/")
-    async def serve_root():
-        return FileResponse(str(STATIC_DIR / "index.html"))
-    
-    @app.head("/")
-    async def head_root():
-        return Response(status_code=200)
-    
-    # Catch-all route for SPA - must be last
-    @app.get("/{full_path:path}")
-    async def serve_spa(request: Request, full_path: str):
+    # Catch-all route for SPA (GET and HEAD) - must be last
+    @app.api_route("/", methods=["GET", "HEAD"])
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def serve_spa(request: Request, full_path: str = ""):
         # Don't serve index.html for API routes
         if full_path.startswith("api/"):
             return {"error": "Not found"}
         
-        # Check if it's a static file request
-        static_file = STATIC_DIR / full_path
-        if static_file.exists() and static_file.is_file():
-            return FileResponse(str(static_file))
-        
-        # Serve index.html for all other routes (SPA routing)
-        index_path = STATIC_DIR / "index.html"
-        if index_path.exists():
-            return FileResponse(str(index_path))
-        return {"error": "Frontend not built"}
-    
-    @app.head("/{full_path:path}")
-    async def head_spa(full_path: str):
-        return Response(status_code=200)
+        # Known files by exact path, index.html for all other routes (SPA routing)
+        return static_site.respond(request, full_path)
 else:
     print(f"Static files not found at {STATIC_DIR} - running in development mode")
     
@@ -0,0 +1,195 @@
+# Instrumentation
+# In-process counters and latency histograms, rendered in the Prometheus
+# text format at /api/metrics. MetricsMiddleware times every request by
+# route template; timed()/Span() time code sections such as parsing,
+# column detection, scoring and the LLM call. Recording is a bisect and a
+# few increments under a lock, so it is cheap enough to leave on. A probe
+# task records event loop lag, which rises when anything blocks the loop. Each
+# uvicorn worker keeps its own numbers; scrape every worker or run one.
+
+import asyncio
+import bisect
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Tuple
+
+from config import METRICS_ENABLED
+
+# How often the event loop lag probe wakes up
+LOOP_LAG_INTERVAL_SECONDS = 0.05
+
+# Seconds; wide enough for sub-millisecond spans and multi-second LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = format_labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+        # Callables returning (name, type, documentation, value) for values owned elsewhere
+        self.collectors: List[Callable[[], List[Tuple[str, str, str, float]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            for name, kind, documentation, value in collect():
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {value:g}"])
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    "fincheck_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+span_duration = registry.histogram(
+    "fincheck_span_duration_seconds", "Time spent in instrumented code sections", ("span",)
+)
+upload_bytes = registry.counter("fincheck_upload_bytes_total", "Bytes received in file uploads")
+llm_tokens = registry.counter("fincheck_llm_tokens_total", "Tokens used by LLM completions", ("type",))
+loop_lag = registry.histogram("fincheck_event_loop_lag_seconds", "How late a periodic event loop timer fired")
+
+class Span:
+    """Context manager timing a block into fincheck_span_duration_seconds; a no-op unless METRICS_ENABLED"""
+    
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        if METRICS_ENABLED:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if METRICS_ENABLED:
+            span_duration.observe(time.perf_counter() - self.started, self.name)
+        return False
+
+def timed(name: str) -> Callable:
+    """Decorator timing every call of a function as the span `name`"""
+    def decorate(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                span_duration.observe(time.perf_counter() - started, name)
+        return wrapper if METRICS_ENABLED else func
+    return decorate
+
+async def monitor_event_loop(interval: float = LOOP_LAG_INTERVAL_SECONDS):
+    """Observe how late each sleep wakes; anything blocking the loop shows up as lag - run as a task in the lifespan"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(loop.time() - started - interval, 0.0))
+
+def route_template(scope: dict) -> str:
+    """Matched route's path template, e.g. /api/upload/history/{upload_id}, so label cardinality stays bounded"""
+    # Recent FastAPI keeps included routes prefix-free and records the full template separately
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    return getattr(scope.get("route"), "path", "unmatched")
+
+class MetricsMiddleware:
+    """ASGI middleware recording each HTTP request's latency under its route template"""
+
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_duration.observe(time.perf_counter() - started, scope["method"], route_template(scope), str(status))
@@ -0,0 +1,69 @@
+# Upload parsing worker pool
+# pandas/openpyxl parsing is CPU-bound, so it runs in a bounded thread pool
+# instead of on the event loop. Jobs past PARSE_MAX_PENDING are rejected
+# up front rather than queued behind a long backlog.
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import profiling
+from config import PARSE_MAX_WORKERS, PARSE_MAX_PENDING, PARSE_TIMEOUT_SECONDS
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_pending = 0
+
+class ParsePoolSaturated(Exception):
+    """Raised when PARSE_MAX_PENDING jobs are already queued or running"""
+
+class ParseTimeout(Exception):
+    """Raised when a job runs longer than PARSE_TIMEOUT_SECONDS"""
+
+def _job_finished(_future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PARSE_MAX_WORKERS, thread_name_prefix="parse")
+    return _executor
+
+def pending_jobs() -> int:
+    return _pending
+
+async def run_parse(func: Callable, *args: Any) -> Any:
+    """Run func(*args) on the parse pool and await its result"""
+    global _pending
+    with _lock:
+        if _pending >= PARSE_MAX_PENDING:
+            raise ParsePoolSaturated("Server is busy processing other files. Please retry shortly.")
+        _pending += 1
+    
+    # The slot is released when the job actually finishes, not when we stop
+    # waiting for it, so timed-out jobs still count against the limit
+    try:
+        with _lock:
+            executor = _get_executor()
+        future = executor.submit(profiling.bind(func), *args)
+    except BaseException:
+        # Never submitted (e.g. the pool was shut down), so no callback will give the slot back
+        with _lock:
+            _pending -= 1
+        raise
+    future.add_done_callback(_job_finished)
+    
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=PARSE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise ParseTimeout(f"File processing exceeded {PARSE_TIMEOUT_SECONDS:g} seconds.")
+
+def shutdown():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,243 @@
+# Opt-in request profiling
+# A sampled fraction of requests (PROFILING_SAMPLE_RATE), or any request
+# sent with an X-Profile header, is profiled by a background thread that
+# reads sys._current_frames() every PROFILING_INTERVAL_MS. Event loop
+# samples count only while the profiled request's own task is running;
+# parse pool threads count while they run a job bound to that request.
+# Stacks are kept in the folded format flamegraph.pl and speedscope read,
+# keyed by request id, with at most PROFILING_MAX_PROFILES retained. The
+# middleware is only installed when PROFILING_ENABLED and
+# PROFILING_ADMIN_TOKEN are both set, so it costs nothing otherwise.
+
+import contextvars
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    PROFILING_ADMIN_TOKEN,
+    PROFILING_INTERVAL_MS,
+    PROFILING_MAX_ACTIVE,
+    PROFILING_MAX_PROFILES,
+    PROFILING_SAMPLE_RATE,
+)
+
+current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def folded_stack(frame, stop=None) -> Optional[str]:
+    """Root-first 'a;b;c' for frame's stack, starting at stop when given; None if stop is not on it"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        if frame is stop:
+            break
+        frame = frame.f_back
+    else:
+        if stop is not None:
+            return None
+    return ";".join(reversed(labels))
+
+class ActiveProfile:
+    """Samples collected for one in-flight request"""
+
+    def __init__(self, request_id: str, method: str, path: str, loop_thread: int, anchor):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.loop_thread = loop_thread
+        # The middleware's own frame: it is on the loop thread's stack only while this request's task runs
+        self.anchor = anchor
+        self.worker_threads: Dict[int, int] = {}
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def enter_thread(self, thread_id: int):
+        with self._lock:
+            self.worker_threads[thread_id] = self.worker_threads.get(thread_id, 0) + 1
+
+    def leave_thread(self, thread_id: int):
+        with self._lock:
+            if self.worker_threads.get(thread_id, 0) <= 1:
+                self.worker_threads.pop(thread_id, None)
+            else:
+                self.worker_threads[thread_id] -= 1
+
+    def sample(self, frames: dict):
+        stacks = []
+        loop_frame = frames.get(self.loop_thread)
+        if loop_frame is not None:
+            stacks.append(folded_stack(loop_frame, self.anchor))
+        with self._lock:
+            workers = list(self.worker_threads)
+        stacks.extend(folded_stack(frames[thread_id]) for thread_id in workers if thread_id in frames)
+        for stack in stacks:
+            if stack:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.samples += 1
+
+    def finish(self, status: int) -> dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": self.started_at,
+            "duration_ms": round((time.time() - self.started_at) * 1000, 1),
+            "interval_ms": PROFILING_INTERVAL_MS,
+            "samples": self.samples,
+            "stacks": self.stacks
+        }
+
+class Sampler:
+    """One background thread sampling every active profile; it exits when none are left"""
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self._active: List[ActiveProfile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def try_start(self, profile: ActiveProfile, limit: int) -> bool:
+        with self._lock:
+            if len(self._active) >= limit:
+                return False
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+            return True
+
+    def stop(self, profile: ActiveProfile):
+        with self._lock:
+            if profile in self._active:
+                self._active.remove(profile)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active)
+            frames = sys._current_frames()
+            frames.pop(me, None)
+            for profile in active:
+                profile.sample(frames)
+            del frames
+            time.sleep(self.interval)
+
+class ProfileStore:
+    """Finished profiles by request id, oldest dropped past max_profiles"""
+
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: dict):
+        with self._lock:
+            self._profiles[profile["request_id"]] = profile
+            self._profiles.move_to_end(profile["request_id"])
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._profiles.get(request_id)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [{key: value for key, value in profile.items() if key != "stacks"} for profile in reversed(profiles)]
+
+    def delete(self, request_id: str) -> bool:
+        with self._lock:
+            return self._profiles.pop(request_id, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+sampler = Sampler(PROFILING_INTERVAL_MS)
+profile_store = ProfileStore(PROFILING_MAX_PROFILES)
+
+def to_folded(profile: dict) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
+
+def bind(func: Callable) -> Callable:
+    """Attribute a pool job to the current request's profile while it runs; func itself when not profiling"""
+    profile = current_profile.get()
+    if profile is None:
+        return func
+
+    def profiled(*args, **kwargs):
+        thread_id = threading.get_ident()
+        profile.enter_thread(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.leave_thread(thread_id)
+    return profiled
+
+def header_value(scope: dict, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def wants_profile(scope: dict) -> bool:
+    requested = header_value(scope, b"x-profile")
+    if requested and requested.lower() not in ("0", "false"):
+        # Only callers presenting the admin token can force a profile
+        token = header_value(scope, b"x-admin-token")
+        return bool(PROFILING_ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, PROFILING_ADMIN_TOKEN)
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling opted-in or sampled requests; adds X-Request-ID and X-Profile-ID"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not wants_profile(scope):
+            return await self.app(scope, receive, send)
+
+        # Always server-generated, so a caller cannot overwrite another request's profile
+        request_id = uuid.uuid4().hex
+        profile = ActiveProfile(request_id, scope["method"], scope["path"], threading.get_ident(), sys._getframe())
+        if not sampler.try_start(profile, PROFILING_MAX_ACTIVE):
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_ids(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                headers.append((b"x-profile-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_ids)
+        finally:
+            current_profile.reset(token)
+            sampler.stop(profile)
+            profile_store.add(profile.finish(status))
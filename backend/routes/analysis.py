@@ -1,10 +1,44 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, field_validator
 from typing import Dict, List, Optional
 import json
 
+import numpy as np
+
+from auth_middleware import get_current_user
+from cache import ResultCache
+from columnar import series_digest
+from config import ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_TTL_SECONDS, ANALYSIS_CACHE_DB
+from history_store import get_history_store
+from http_cache import etag_matches, make_etag, not_modified
+from scoring import (
+    INSUFFICIENT_DATA,
+    score_cash_flow_stability,
+    score_debt_burden,
+    score_expense_ratio,
+    SERIES_FIELDS,
+    score_batch,
+    score_financial_data,
+    score_working_capital_gap,
+)
+from timeseries import SCORE_COLUMNS, rolling_scores
+
 router = APIRouter()
 
+# Scores are a pure function of the series, so repeat requests for the same
+# data (tab switches, pre-benchmark and pre-insights calls) skip scoring
+analysis_cache = ResultCache(
+    "analysis",
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANALYSIS_CACHE_TTL_SECONDS,
+    db_path=ANALYSIS_CACHE_DB
+)
+
+# Clients must revalidate, but an unchanged result comes back as a bodiless 304
+ANALYSIS_CACHE_CONTROL = "private, no-cache"
+
 class FinancialData(BaseModel):
     revenue: Optional[List[float]] = []
     expenses: Optional[List[float]] = []
@@ -16,12 +50,120 @@ class FinancialData(BaseModel):
     emi: Optional[List[float]] = []
 
 class AnalysisRequest(BaseModel):
-    upload_id: Optional[str] = None
+    # The upload_id returned by /api/upload/file: links the stored analysis to it, or is
+    # re-scored when financial_data is omitted. Integer, as history ids are.
+    upload_id: Optional[int] = None
     financial_data: Optional[FinancialData] = None
+    # Tags the stored analysis for the benchmark aggregation job
+    industry: Optional[str] = None
+
+    @field_validator("upload_id", mode="before")
+    @classmethod
+    def accept_string_upload_id(cls, value):
+        """Older clients sent upload_id as a string; numeric ones still link, anything else is ignored"""
+        if isinstance(value, str):
+            return int(value) if value.strip().isdigit() else None
+        return value
+
+class IncrementalRequest(BaseModel):
+    financial_data: FinancialData
+
+class TimeSeriesRequest(BaseModel):
+    financial_data: FinancialData
+    windows: List[int] = [3, 6, 12]
+
+class BusinessFinancialData(FinancialData):
+    business_id: str
+
+class ColumnarFinancialData(BaseModel):
+    """One row per period; series columns align with business_id, nulls are skipped"""
+    business_id: List[str]
+    revenue: Optional[List[Optional[float]]] = None
+    expenses: Optional[List[Optional[float]]] = None
+    cash_inflow: Optional[List[Optional[float]]] = None
+    cash_outflow: Optional[List[Optional[float]]] = None
+    receivables: Optional[List[Optional[float]]] = None
+    payables: Optional[List[Optional[float]]] = None
+    loans: Optional[List[Optional[float]]] = None
+    emi: Optional[List[Optional[float]]] = None
+
+class BatchAnalysisRequest(BaseModel):
+    businesses: Optional[List[BusinessFinancialData]] = None
+    columns: Optional[ColumnarFinancialData] = None
+
+def batch_series_from_businesses(businesses: List[BusinessFinancialData]) -> tuple:
+    business_ids = [business.business_id for business in businesses]
+    series = {}
+    for field in SERIES_FIELDS:
+        lists = [getattr(business, field) or [] for business in businesses]
+        lengths = np.fromiter((len(values) for values in lists), dtype=np.intp, count=len(lists))
+        values = np.fromiter((v for values in lists for v in values), dtype=np.float64, count=int(lengths.sum()))
+        series[field] = (values, np.repeat(np.arange(len(lists)), lengths))
+    return business_ids, series
+
+def batch_series_from_columns(columns: ColumnarFinancialData) -> tuple:
+    index = {}
+    groups = np.fromiter(
+        (index.setdefault(business_id, len(index)) for business_id in columns.business_id),
+        dtype=np.intp, count=len(columns.business_id)
+    )
+    series = {}
+    for field in SERIES_FIELDS:
+        column = getattr(columns, field)
+        if column is None:
+            continue
+        if len(column) != len(groups):
+            raise ValueError(f"Column '{field}' has {len(column)} values but business_id has {len(groups)}")
+        values = np.array(column, dtype=np.float64)
+        present = ~np.isnan(values)
+        series[field] = (values[present], groups[present])
+    return list(index), series
+
+def ndjson_lines(business_ids: List[str], results: List[dict], chunk_size: int = 500):
+    for start in range(0, len(results), chunk_size):
+        yield "".join(
+            json.dumps({"business_id": business_id, **result}) + "\n"
+            for business_id, result in zip(business_ids[start:start + chunk_size], results[start:start + chunk_size])
+        )
+
+def incremental_store():
+    """The history store, which keys every business by (user id, business id). Incremental
+    analysis shares its opt-in: with HISTORY_DB_PATH unset the endpoints are unavailable."""
+    store = get_history_store()
+    if not store:
+        raise HTTPException(status_code=503, detail="Incremental analysis requires HISTORY_DB_PATH to be set")
+    return store
+
+def score_business(store, user_id: str, business_id: str, aggregates) -> dict:
+    result = aggregates.score(lambda: store.get_business_inflows(user_id, business_id))
+    return {"business_id": business_id, "periods": aggregates.counts(), **result}
+
+MAX_TIMESERIES_WINDOWS = 12
+
+def timeseries_columns(financial_data: FinancialData, windows: List[int]) -> dict:
+    series = {field: np.asarray(getattr(financial_data, field) or [], dtype=np.float64) for field in SERIES_FIELDS}
+    if not all(np.isfinite(values).all() for values in series.values()):
+        raise ValueError("Series values must be finite numbers")
+    n_periods = max(values.size for values in series.values())
+    
+    results = []
+    for window in sorted(set(windows)):
+        if window > n_periods:
+            continue
+        columns = rolling_scores(series, window)
+        results.append({
+            "window": window,
+            "end": columns["end"].tolist(),
+            **{metric: columns[metric].tolist() for metric in SCORE_COLUMNS},
+            "grade": columns["grade"].tolist(),
+            "expense_ratio_percent": np.round(columns["expense_ratio_percent"], 2).tolist(),
+            "working_capital_gap": np.round(columns["working_capital_gap"], 2).tolist()
+        })
+    return {"periods": n_periods, "windows": results}
 
 def calculate_cash_flow_stability(cash_inflow: List[float], cash_outflow: List[float]) -> dict:
     if not cash_inflow or not cash_outflow:
-        return {"score": 50, "status": "unknown", "explanation": "Insufficient cash flow data"}
+        return dict(INSUFFICIENT_DATA["cash_flow_stability"])
     
     net_cash_flow = [inflow - outflow for inflow, outflow in zip(cash_inflow, cash_outflow)]
     
@@ -32,230 +174,176 @@ def calculate_cash_flow_stability(cash_inflow: List[float], cash_outflow: List[f
     variance = sum((cf - avg_inflow) ** 2 for cf in cash_inflow) / len(cash_inflow)
     cv = (variance ** 0.5) / avg_inflow if avg_inflow > 0 else 1
     
-    score = min(100, max(0, int((stability_ratio * 60) + ((1 - min(cv, 1)) * 40))))
-    
-    if score >= 70:
-        status = "healthy"
-        explanation = "Your cash flow is stable with consistent positive net flows."
-    elif score >= 50:
-        status = "moderate"
-        explanation = "Your cash flow shows some variability. Consider building cash reserves."
-    else:
-        status = "at_risk"
-        explanation = "Your cash flow is unstable. Immediate attention to cash management is needed."
-    
-    return {"score": score, "status": status, "explanation": explanation}
+    return score_cash_flow_stability(stability_ratio, cv)
 
 def calculate_expense_ratio(revenue: List[float], expenses: List[float]) -> dict:
     if not revenue or not expenses:
-        return {"score": 50, "ratio": 0, "status": "unknown", "explanation": "Insufficient data"}
-    
-    total_revenue = sum(revenue)
-    total_expenses = sum(expenses)
-    
-    if total_revenue == 0:
-        return {"score": 0, "ratio": 100, "status": "critical", "explanation": "No revenue recorded"}
-    
-    ratio = (total_expenses / total_revenue) * 100
+        return dict(INSUFFICIENT_DATA["expense_ratio"])
     
-    if ratio < 60:
-        score = 100
-        status = "excellent"
-        explanation = f"Excellent expense management! Your expenses are {ratio:.1f}% of revenue."
-    elif ratio < 75:
-        score = 80
-        status = "healthy"
-        explanation = f"Good expense control. Expenses at {ratio:.1f}% of revenue."
-    elif ratio < 90:
-        score = 60
-        status = "moderate"
-        explanation = f"Expenses at {ratio:.1f}% of revenue. Look for cost optimization opportunities."
-    elif ratio < 100:
-        score = 40
-        status = "warning"
-        explanation = f"High expenses at {ratio:.1f}% of revenue. Profitability is at risk."
-    else:
-        score = 20
-        status = "critical"
-        explanation = f"Expenses exceed revenue at {ratio:.1f}%. Urgent cost reduction needed."
-    
-    return {"score": score, "ratio": round(ratio, 2), "status": status, "explanation": explanation}
+    return score_expense_ratio(sum(revenue), sum(expenses))
 
 def calculate_working_capital_gap(receivables: List[float], payables: List[float]) -> dict:
     if not receivables or not payables:
-        return {"score": 50, "gap": 0, "status": "unknown", "explanation": "Insufficient data"}
+        return dict(INSUFFICIENT_DATA["working_capital"])
     
     avg_receivables = sum(receivables) / len(receivables)
     avg_payables = sum(payables) / len(payables)
     
-    gap = avg_receivables - avg_payables
-    
-    if avg_payables > 0:
-        gap_ratio = gap / avg_payables
-    else:
-        gap_ratio = 0
-    
-    if gap_ratio < 0:
-        score = 90
-        status = "excellent"
-        explanation = "You collect faster than you pay. Strong working capital position."
-    elif gap_ratio < 0.5:
-        score = 70
-        status = "healthy"
-        explanation = "Balanced working capital. Collections and payments are well managed."
-    elif gap_ratio < 1:
-        score = 50
-        status = "moderate"
-        explanation = "Working capital gap is widening. Consider faster collection strategies."
-    else:
-        score = 30
-        status = "at_risk"
-        explanation = "Significant working capital gap. May face cash flow issues."
-    
-    return {"score": score, "gap": round(gap, 2), "status": status, "explanation": explanation}
+    return score_working_capital_gap(avg_receivables, avg_payables)
 
 def calculate_debt_burden(revenue: List[float], loans: List[float], emi: List[float]) -> dict:
     if not revenue:
-        return {"score": 50, "ratio": 0, "status": "unknown", "explanation": "Insufficient data"}
+        return dict(INSUFFICIENT_DATA["debt_burden"])
     
     total_revenue = sum(revenue)
     total_loans = sum(loans) if loans else 0
     total_emi = sum(emi) if emi else 0
     
-    if total_revenue == 0:
-        return {"score": 0, "ratio": 100, "status": "critical", "explanation": "No revenue to service debt"}
-    
-    debt_service_ratio = (total_emi / total_revenue) * 100 if total_emi else 0
-    debt_to_revenue = (total_loans / total_revenue) * 100 if total_loans else 0
-    
-    combined_ratio = (debt_service_ratio * 0.6) + (min(debt_to_revenue, 100) * 0.4)
-    
-    if combined_ratio < 15:
-        score = 95
-        status = "excellent"
-        explanation = "Very low debt burden. Strong financial position."
-    elif combined_ratio < 30:
-        score = 80
-        status = "healthy"
-        explanation = "Manageable debt levels. Good capacity for growth."
-    elif combined_ratio < 50:
-        score = 60
-        status = "moderate"
-        explanation = "Moderate debt burden. Be cautious with additional borrowing."
-    elif combined_ratio < 70:
-        score = 40
-        status = "warning"
-        explanation = "High debt burden. Focus on debt reduction."
-    else:
-        score = 20
-        status = "critical"
-        explanation = "Very high debt burden. Debt restructuring may be needed."
-    
-    return {
-        "score": score, 
-        "debt_service_ratio": round(debt_service_ratio, 2),
-        "debt_to_revenue": round(debt_to_revenue, 2),
-        "status": status, 
-        "explanation": explanation
-    }
-
-def calculate_creditworthiness(scores: dict) -> dict:
-    weights = {
-        "cash_flow_stability": 0.25,
-        "expense_ratio": 0.20,
-        "working_capital": 0.20,
-        "debt_burden": 0.35
-    }
-    
-    weighted_score = sum(
-        scores.get(metric, {}).get("score", 50) * weight 
-        for metric, weight in weights.items()
-    )
-    
-    final_score = min(100, max(0, int(weighted_score)))
-    
-    if final_score >= 80:
-        grade = "A"
-        status = "excellent"
-        explanation = "Excellent creditworthiness. Eligible for best loan terms."
-    elif final_score >= 65:
-        grade = "B"
-        status = "good"
-        explanation = "Good creditworthiness. Eligible for competitive loan products."
-    elif final_score >= 50:
-        grade = "C"
-        status = "fair"
-        explanation = "Fair creditworthiness. Some loan products may be available."
-    elif final_score >= 35:
-        grade = "D"
-        status = "poor"
-        explanation = "Below average creditworthiness. Limited financing options."
-    else:
-        grade = "E"
-        status = "very_poor"
-        explanation = "Poor creditworthiness. Consider improving finances before applying for credit."
-    
-    return {
-        "score": final_score,
-        "grade": grade,
-        "status": status,
-        "explanation": explanation
-    }
+    return score_debt_burden(total_revenue, total_loans, total_emi)
+
+def score_cached(financial_data: Dict, data_hash: str) -> dict:
+    """A copy of the scores for financial_data, from analysis_cache when present"""
+    analysis_result = analysis_cache.get(data_hash)
+    if analysis_result is None:
+        analysis_result = score_financial_data(financial_data)
+        analysis_cache.set(data_hash, analysis_result)
+    return dict(analysis_result)
 
 @router.post("/calculate")
-async def calculate_financial_health(request: AnalysisRequest):
+async def calculate_financial_health(request: AnalysisRequest, http_request: Request, user=Depends(get_current_user)):
     try:
+        store = get_history_store()
+        
         if request.financial_data:
             financial_data = request.financial_data.model_dump()
+        elif request.upload_id is not None and store:
+            # Re-score a stored upload without the client re-sending its series
+            upload = await run_in_threadpool(store.get_upload, user.id, request.upload_id)
+            if upload is None:
+                raise HTTPException(status_code=404, detail="Upload not found")
+            financial_data = upload["financial_data"]
         else:
             raise HTTPException(status_code=400, detail="No financial data provided")
         
-        cash_flow_stability = calculate_cash_flow_stability(
-            financial_data.get("cash_inflow", []),
-            financial_data.get("cash_outflow", [])
-        )
+        # Hashing and scoring are CPU-bound, so both run off the event loop
+        data_hash = await run_in_threadpool(series_digest, financial_data)
+        etag = make_etag("analysis", data_hash, user.id)
+        revalidated = etag_matches(http_request, etag)
+        # A revalidation can still carry an upload_id or industry the stored analysis lacks
+        links = store is not None and (request.upload_id is not None or bool(request.industry))
+        if revalidated and not links:
+            return not_modified(etag, ANALYSIS_CACHE_CONTROL)
         
-        expense_ratio = calculate_expense_ratio(
-            financial_data.get("revenue", []),
-            financial_data.get("expenses", [])
-        )
+        analysis_result = await run_in_threadpool(score_cached, financial_data, data_hash)
         
-        working_capital = calculate_working_capital_gap(
-            financial_data.get("receivables", []),
-            financial_data.get("payables", [])
-        )
-        
-        debt_burden = calculate_debt_burden(
-            financial_data.get("revenue", []),
-            financial_data.get("loans", []),
-            financial_data.get("emi", [])
-        )
-        
-        all_scores = {
-            "cash_flow_stability": cash_flow_stability,
-            "expense_ratio": expense_ratio,
-            "working_capital": working_capital,
-            "debt_burden": debt_burden
-        }
+        if store:
+            analysis_result["analysis_id"] = await run_in_threadpool(
+                store.save_analysis, user.id, data_hash, analysis_result, request.upload_id, request.industry
+            )
         
-        creditworthiness = calculate_creditworthiness(all_scores)
+        if revalidated:
+            return not_modified(etag, ANALYSIS_CACHE_CONTROL)
+        return JSONResponse(analysis_result, headers={"ETag": etag, "Cache-Control": ANALYSIS_CACHE_CONTROL})
         
-        analysis_result = {
-            "cash_flow_stability": cash_flow_stability,
-            "expense_ratio": expense_ratio,
-            "working_capital": working_capital,
-            "debt_burden": debt_burden,
-            "creditworthiness": creditworthiness,
-            "overall_health": creditworthiness["status"]
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return analysis_cache.stats()
+
+@router.post("/batch")
+async def calculate_batch(request: BatchAnalysisRequest):
+    """Score many businesses in one request, streamed back as NDJSON"""
+    try:
+        if request.columns is not None:
+            business_ids, series = await run_in_threadpool(batch_series_from_columns, request.columns)
+        elif request.businesses is not None:
+            business_ids, series = await run_in_threadpool(batch_series_from_businesses, request.businesses)
+        else:
+            raise HTTPException(status_code=400, detail="Provide either 'businesses' or 'columns'")
         
-        return analysis_result
+        # Scoring a large batch takes a while; keep the event loop free for other requests meanwhile
+        results = await run_in_threadpool(score_batch, series, len(business_ids))
         
+        return StreamingResponse(ndjson_lines(business_ids, results), media_type="application/x-ndjson")
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/timeseries")
+def calculate_timeseries(request: TimeSeriesRequest):
+    """Scores over every trailing window of each requested length, as columns for charting.
+    `end` is the 1-based period each window closes on."""
+    if not request.windows or len(set(request.windows)) > MAX_TIMESERIES_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_TIMESERIES_WINDOWS} window lengths")
+    if min(request.windows) < 1:
+        raise HTTPException(status_code=400, detail="Window lengths must be at least 1 period")
+    
+    try:
+        # Plain lists already; skip FastAPI's per-element jsonable_encoder walk
+        return JSONResponse(timeseries_columns(request.financial_data, request.windows))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/history")
-async def get_analysis_history():
-    # No database - return empty history
-    return {"analyses": [], "message": "Analysis history is stored locally only"}
+def get_analysis_history(
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user)
+):
+    """Most recent analyses first; pass next_cursor back to fetch the next page"""
+    store = get_history_store()
+    if not store:
+        return {"analyses": [], "next_cursor": None}
+    
+    try:
+        analyses, next_cursor = store.list_analyses(user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"analyses": analyses, "next_cursor": next_cursor}
+
+@router.get("/history/{analysis_id}")
+def get_analysis(analysis_id: int, user=Depends(get_current_user)):
+    store = get_history_store()
+    analysis = store.get_analysis(user.id, analysis_id) if store else None
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return analysis
+
+@router.post("/incremental/{business_id}")
+def append_business_periods(business_id: str, request: IncrementalRequest, user=Depends(get_current_user)):
+    """Append new periods to a business's history and rescore it without re-reading the history"""
+    store = incremental_store()
+    try:
+        aggregates = store.append_business_periods(user.id, business_id, request.financial_data.model_dump())
+        return score_business(store, user.id, business_id, aggregates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/incremental/{business_id}")
+def get_business_score(business_id: str, user=Depends(get_current_user)):
+    store = incremental_store()
+    aggregates = store.get_business_aggregates(user.id, business_id)
+    if aggregates is None:
+        raise HTTPException(status_code=404, detail="Business not found")
+    return score_business(store, user.id, business_id, aggregates)
 
+@router.delete("/incremental/{business_id}")
+def delete_business(business_id: str, user=Depends(get_current_user)):
+    """Drop a business's running aggregates so its history can be replayed from scratch"""
+    store = incremental_store()
+    if not store.delete_business(user.id, business_id):
+        raise HTTPException(status_code=404, detail="Business not found")
+    return {"business_id": business_id, "deleted": True}
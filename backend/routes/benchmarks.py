@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+import math
+
+import numpy as np
+
+from benchmark_distributions import METRIC_HIGHER_IS_BETTER, DistributionSet, distribution_store
+from http_cache import PrecompressedJSON
 
 router = APIRouter()
 
@@ -91,6 +97,14 @@ class BenchmarkRequest(BaseModel):
     industry: str
     analysis_data: Dict
 
+class PortfolioBusiness(BaseModel):
+    business_id: str
+    industry: str
+    analysis_data: Dict
+
+class PortfolioRankRequest(BaseModel):
+    businesses: List[PortfolioBusiness]
+
 def compare_metric(actual: float, benchmark: float, higher_is_better: bool = True) -> dict:
     difference = actual - benchmark
     percentage_diff = (difference / benchmark * 100) if benchmark != 0 else 0
@@ -120,67 +134,183 @@ def compare_metric(actual: float, benchmark: float, higher_is_better: bool = Tru
         "is_better": is_better
     }
 
-@router.get("/industries")
-async def get_industries():
+# The catalog only changes when distributions reload; let browsers and CDNs
+# reuse it briefly, then revalidate against the ETag
+CATALOG_CACHE_CONTROL = "public, max-age=300"
+
+def industry_benchmark(industry: str, distributions: DistributionSet) -> dict:
+    """Built-in benchmark, with observed means from the published snapshot taking over"""
     return {
-        "industries": [
-            {"id": key, "name": value["name"]} 
-            for key, value in INDUSTRY_BENCHMARKS.items()
-        ]
+        **INDUSTRY_BENCHMARKS[industry],
+        **{metric: round(mean, 2) for metric, mean in distributions.means.get(industry, {}).items()}
     }
 
+class BenchmarkCatalog:
+    """Catalog responses, serialized and compressed once per distributions version"""
+
+    def __init__(self):
+        self.version = None
+        self.industries: Optional[PrecompressedJSON] = None
+        self.by_industry: Dict[str, PrecompressedJSON] = {}
+
+    def current(self) -> "BenchmarkCatalog":
+        distributions = distribution_store.current()
+        if distributions.version != self.version:
+            self.industries = PrecompressedJSON({
+                "industries": [
+                    {"id": key, "name": value["name"]} 
+                    for key, value in INDUSTRY_BENCHMARKS.items()
+                ]
+            }, CATALOG_CACHE_CONTROL)
+            self.by_industry = {
+                industry: PrecompressedJSON(industry_benchmark(industry, distributions), CATALOG_CACHE_CONTROL)
+                for industry in INDUSTRY_BENCHMARKS
+            }
+            self.version = distributions.version
+        return self
+
+catalog = BenchmarkCatalog().current()
+
+@router.get("/industries")
+async def get_industries(request: Request):
+    return catalog.current().industries.respond(request)
+
 @router.get("/industry/{industry_id}")
-async def get_industry_benchmark(industry_id: str):
-    if industry_id not in INDUSTRY_BENCHMARKS:
+async def get_industry_benchmark(industry_id: str, request: Request):
+    response = catalog.current().by_industry.get(industry_id)
+    if response is None:
         raise HTTPException(status_code=404, detail="Industry not found")
     
-    return INDUSTRY_BENCHMARKS[industry_id]
+    return response.respond(request)
 
-@router.post("/compare")
-async def compare_with_benchmark(request: BenchmarkRequest):
+def benchmark_metric_values(analysis: dict) -> dict:
+    """Pull the benchmarked metric values out of an analysis result"""
+    return {
+        "expense_ratio": analysis.get("expense_ratio", {}).get("ratio", 75),
+        "cash_flow_stability": analysis.get("cash_flow_stability", {}).get("score", 50),
+        "working_capital_gap": abs(analysis.get("working_capital", {}).get("gap", 0)),
+        "debt_to_revenue": analysis.get("debt_burden", {}).get("debt_to_revenue", 30)
+    }
+
+def normalize_industry(industry: str) -> str:
+    industry = industry.lower().replace(" ", "_")
+    return industry if industry in INDUSTRY_BENCHMARKS else "services"
+
+def better_than_percent(percentile, metric: str):
+    """Share of industry peers this business beats on the metric"""
+    return percentile if METRIC_HIGHER_IS_BETTER[metric] else 100 - percentile
+
+def compare_analysis(industry: str, analysis: dict) -> dict:
+    industry = normalize_industry(industry)
+    
+    distributions = distribution_store.current()
+    benchmark = industry_benchmark(industry, distributions)
+    actual = benchmark_metric_values(analysis)
+    
+    comparisons = {
+        "expense_ratio": compare_metric(actual["expense_ratio"], benchmark["expense_ratio"], higher_is_better=False),
+        "cash_flow_stability": compare_metric(actual["cash_flow_stability"], benchmark["cash_flow_stability"], higher_is_better=True),
+        "working_capital_gap": compare_metric(actual["working_capital_gap"], benchmark["working_capital_gap"], higher_is_better=False),
+        "debt_to_revenue": compare_metric(actual["debt_to_revenue"], benchmark["debt_to_revenue"], higher_is_better=False)
+    }
+    
+    for metric, comparison in comparisons.items():
+        table = distributions.table(industry, metric)
+        if table is not None:
+            percentile = float(table.rank(actual[metric]))
+            comparison["percentile"] = round(percentile, 1)
+            comparison["better_than_percent"] = round(better_than_percent(percentile, metric), 1)
+            comparison["distribution_source"] = distributions.source(industry, metric)
+    
+    better_count = sum(1 for c in comparisons.values() if c["is_better"])
+    total_metrics = len(comparisons)
+    
+    if better_count >= 3:
+        overall_status = "above_average"
+        overall_message = f"Your business outperforms the {benchmark['name']} industry average in {better_count} out of {total_metrics} key metrics."
+    elif better_count >= 2:
+        overall_status = "average"
+        overall_message = f"Your business is performing at par with the {benchmark['name']} industry average."
+    else:
+        overall_status = "below_average"
+        overall_message = f"Your business is underperforming compared to the {benchmark['name']} industry average. Focus on improvement areas."
+    
+    return {
+        "industry": industry,
+        "industry_name": benchmark["name"],
+        "comparisons": comparisons,
+        "overall_status": overall_status,
+        "overall_message": overall_message,
+        "better_metrics": better_count,
+        "total_metrics": total_metrics,
+        "distribution_version": distributions.version,
+        "synthetic": any(distributions.is_synthetic(industry, metric) for metric in comparisons)
+    }
+
+def rank_portfolio(industries: List[str], analyses: List[dict]) -> tuple:
+    """Percentile ranks of every business against its industry's distributions,
+    one np.interp per industry and metric; NaN where no distribution is loaded.
+    Also reports whether any synthetic table was used"""
+    distributions = distribution_store.current()
+    codes, groups = np.unique([normalize_industry(industry) for industry in industries], return_inverse=True)
+    metric_values = [benchmark_metric_values(analysis) for analysis in analyses]
+    
+    ranks = {}
+    synthetic = False
+    for metric in METRIC_HIGHER_IS_BETTER:
+        values = np.array([row[metric] for row in metric_values], dtype=np.float64)
+        ranks[metric] = np.full(values.shape, np.nan)
+        for k, industry in enumerate(codes):
+            table = distributions.table(industry, metric)
+            if table is not None:
+                members = groups == k
+                ranks[metric][members] = table.rank(values[members])
+                synthetic = synthetic or distributions.is_synthetic(industry, metric)
+    return distributions.version, synthetic, codes[groups].tolist(), ranks
+
+def rounded_or_none(values: np.ndarray) -> list:
+    return [None if math.isnan(value) else value for value in np.round(values, 1).tolist()]
+
+@router.get("/distributions")
+async def get_distributions():
+    return distribution_store.describe()
+
+@router.post("/rank")
+async def rank_businesses(request: PortfolioRankRequest):
+    """Rank a whole portfolio against each business's industry distributions"""
+    if not request.businesses:
+        raise HTTPException(status_code=400, detail="No businesses provided")
+    
     try:
-        industry = request.industry.lower().replace(" ", "_")
-        
-        if industry not in INDUSTRY_BENCHMARKS:
-            industry = "services"
-        
-        benchmark = INDUSTRY_BENCHMARKS[industry]
-        analysis = request.analysis_data
+        version, synthetic, industries, ranks = rank_portfolio(
+            [business.industry for business in request.businesses],
+            [business.analysis_data for business in request.businesses]
+        )
         
-        expense_actual = analysis.get("expense_ratio", {}).get("ratio", 75)
-        cash_flow_actual = analysis.get("cash_flow_stability", {}).get("score", 50)
-        working_capital_actual = abs(analysis.get("working_capital", {}).get("gap", 0))
-        debt_actual = analysis.get("debt_burden", {}).get("debt_to_revenue", 30)
-        
-        comparisons = {
-            "expense_ratio": compare_metric(expense_actual, benchmark["expense_ratio"], higher_is_better=False),
-            "cash_flow_stability": compare_metric(cash_flow_actual, benchmark["cash_flow_stability"], higher_is_better=True),
-            "working_capital_gap": compare_metric(working_capital_actual, benchmark["working_capital_gap"], higher_is_better=False),
-            "debt_to_revenue": compare_metric(debt_actual, benchmark["debt_to_revenue"], higher_is_better=False)
-        }
-        
-        better_count = sum(1 for c in comparisons.values() if c["is_better"])
-        total_metrics = len(comparisons)
-        
-        if better_count >= 3:
-            overall_status = "above_average"
-            overall_message = f"Your business outperforms the {benchmark['name']} industry average in {better_count} out of {total_metrics} key metrics."
-        elif better_count >= 2:
-            overall_status = "average"
-            overall_message = f"Your business is performing at par with the {benchmark['name']} industry average."
-        else:
-            overall_status = "below_average"
-            overall_message = f"Your business is underperforming compared to the {benchmark['name']} industry average. Focus on improvement areas."
+        percentiles = {metric: rounded_or_none(values) for metric, values in ranks.items()}
+        better = {metric: rounded_or_none(better_than_percent(values, metric)) for metric, values in ranks.items()}
         
         return {
-            "industry": industry,
-            "industry_name": benchmark["name"],
-            "comparisons": comparisons,
-            "overall_status": overall_status,
-            "overall_message": overall_message,
-            "better_metrics": better_count,
-            "total_metrics": total_metrics
+            "distribution_version": version,
+            "synthetic": synthetic,
+            "results": [
+                {
+                    "business_id": business.business_id,
+                    "industry": industries[i],
+                    "percentiles": {metric: percentiles[metric][i] for metric in ranks},
+                    "better_than_percent": {metric: better[metric][i] for metric in ranks}
+                }
+                for i, business in enumerate(request.businesses)
+            ]
         }
-        
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/compare")
+async def compare_with_benchmark(request: BenchmarkRequest):
+    try:
+        return compare_analysis(request.industry, request.analysis_data)
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
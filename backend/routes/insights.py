@@ -1,20 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Optional
-import os
-from openai import OpenAI
+import json
 
-router = APIRouter()
+from cache import ResultCache, make_key
+from config import GROQ_MODEL, INSIGHTS_CACHE_MAX_ENTRIES, INSIGHTS_CACHE_TTL_SECONDS, INSIGHTS_CACHE_DB
+from llm_client import get_client, is_configured, llm_slot, LLMBusyError
+from metrics import Span, llm_tokens
 
-# Groq API configuration - uses OpenAI-compatible API
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
-GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+router = APIRouter()
 
-# Initialize Groq client (OpenAI-compatible)
-client = OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url=GROQ_BASE_URL
-) if GROQ_API_KEY else None
+# Identical dashboards render identical prompts, so completions are cached
+# on a hash of the full request sent to the model
+insights_cache = ResultCache(
+    "insights",
+    max_entries=INSIGHTS_CACHE_MAX_ENTRIES,
+    ttl_seconds=INSIGHTS_CACHE_TTL_SECONDS,
+    db_path=INSIGHTS_CACHE_DB
+)
 
 class InsightsRequest(BaseModel):
     analysis_data: Dict
@@ -70,81 +74,180 @@ INSIGHTS_PROMPT_HI = """निम्नलिखित वित्तीय व
 
 अपनी प्रतिक्रिया को हेडर के साथ स्पष्ट खंडों में प्रारूपित करें।"""
 
+def build_insights_completion(request: InsightsRequest) -> dict:
+    analysis = request.analysis_data
+    
+    prompt_template = INSIGHTS_PROMPT_HI if request.language == "hi" else INSIGHTS_PROMPT_EN
+    
+    prompt = prompt_template.format(
+        business_name=request.business_name or "Your Business",
+        industry=request.industry or "General",
+        cash_flow_score=analysis.get("cash_flow_stability", {}).get("score", "N/A"),
+        cash_flow_status=analysis.get("cash_flow_stability", {}).get("status", "unknown"),
+        expense_ratio=analysis.get("expense_ratio", {}).get("ratio", "N/A"),
+        expense_status=analysis.get("expense_ratio", {}).get("status", "unknown"),
+        working_capital_status=analysis.get("working_capital", {}).get("status", "unknown"),
+        debt_status=analysis.get("debt_burden", {}).get("status", "unknown"),
+        credit_score=analysis.get("creditworthiness", {}).get("score", "N/A"),
+        credit_grade=analysis.get("creditworthiness", {}).get("grade", "N/A")
+    )
+    
+    # Using Groq's llama model (fast and free tier available)
+    return {
+        "model": GROQ_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 2048,
+        "temperature": 0.7
+    }
+
+def build_quick_summary_completion(request: InsightsRequest) -> dict:
+    analysis = request.analysis_data
+    credit_score = analysis.get("creditworthiness", {}).get("score", 50)
+    credit_grade = analysis.get("creditworthiness", {}).get("grade", "C")
+    
+    if request.language == "hi":
+        prompt = f"""एक SME के लिए जिसका क्रेडिट स्कोर {credit_score}/100 (ग्रेड {credit_grade}) है, 
+        एक 2-वाक्य सारांश दें जो उनकी वित्तीय स्थिति और एक प्राथमिकता कार्रवाई बताता है।"""
+    else:
+        prompt = f"""For an SME with credit score {credit_score}/100 (Grade {credit_grade}), 
+        provide a 2-sentence summary of their financial position and one priority action."""
+    
+    return {
+        "model": GROQ_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a concise financial advisor. Be brief and actionable."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 200
+    }
+
+def count_tokens(usage):
+    if usage:
+        llm_tokens.inc(usage.prompt_tokens, "prompt")
+        llm_tokens.inc(usage.completion_tokens, "completion")
+
+async def complete_cached(completion: dict) -> dict:
+    """Run a chat completion, serving identical requests from insights_cache"""
+    key = make_key(completion)
+    cached = await insights_cache.get_async(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    
+    client = get_client()
+    async with llm_slot():
+        with Span("llm_completion"):
+            response = await client.chat.completions.create(**completion)
+    
+    count_tokens(response.usage)
+    result = {
+        "content": response.choices[0].message.content,
+        "tokens_used": response.usage.total_tokens if response.usage else 0
+    }
+    await insights_cache.set_async(key, result)
+    return {**result, "cached": False}
+
 @router.post("/generate")
 async def generate_insights(request: InsightsRequest):
-    if not client:
+    if not is_configured():
         raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY environment variable.")
     
     try:
-        analysis = request.analysis_data
-        
-        prompt_template = INSIGHTS_PROMPT_HI if request.language == "hi" else INSIGHTS_PROMPT_EN
-        
-        prompt = prompt_template.format(
-            business_name=request.business_name or "Your Business",
-            industry=request.industry or "General",
-            cash_flow_score=analysis.get("cash_flow_stability", {}).get("score", "N/A"),
-            cash_flow_status=analysis.get("cash_flow_stability", {}).get("status", "unknown"),
-            expense_ratio=analysis.get("expense_ratio", {}).get("ratio", "N/A"),
-            expense_status=analysis.get("expense_ratio", {}).get("status", "unknown"),
-            working_capital_status=analysis.get("working_capital", {}).get("status", "unknown"),
-            debt_status=analysis.get("debt_burden", {}).get("status", "unknown"),
-            credit_score=analysis.get("creditworthiness", {}).get("score", "N/A"),
-            credit_grade=analysis.get("creditworthiness", {}).get("grade", "N/A")
-        )
-        
-        # Using Groq's llama model (fast and free tier available)
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=2048,
-            temperature=0.7
-        )
-        
-        insights_text = response.choices[0].message.content
+        result = await complete_cached(build_insights_completion(request))
         
         return {
-            "insights": insights_text,
+            "insights": result["content"],
             "language": request.language,
-            "tokens_used": response.usage.total_tokens if response.usage else 0
+            "tokens_used": result["tokens_used"],
+            "cached": result["cached"]
         }
         
+    except LLMBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_completion(completion: dict, request: Request, language: str):
+    """Yield server-sent events for each generated token, then a trailing done event"""
+    key = make_key(completion)
+    cached = await insights_cache.get_async(key)
+    if cached is not None:
+        yield sse_event("token", {"content": cached["content"]})
+        yield sse_event("done", {"language": language, "tokens_used": cached["tokens_used"], "cached": True})
+        return
+    
+    parts = []
+    tokens_used = 0
+    usage = None
+    
+    try:
+        client = get_client()
+        async with llm_slot():
+            with Span("llm_stream"):
+                stream = await client.chat.completions.create(
+                    **completion,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                try:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            usage = chunk.usage
+                            tokens_used = chunk.usage.total_tokens
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            yield sse_event("token", {"content": chunk.choices[0].delta.content})
+                        # Stop paying for tokens nobody will read
+                        if await request.is_disconnected():
+                            return
+                finally:
+                    await stream.close()
+                    count_tokens(usage)
+    except LLMBusyError as e:
+        yield sse_event("error", {"detail": str(e)})
+        return
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Error generating insights: {str(e)}"})
+        return
+    
+    await insights_cache.set_async(key, {"content": "".join(parts), "tokens_used": tokens_used})
+    yield sse_event("done", {"language": language, "tokens_used": tokens_used, "cached": False})
+
+@router.post("/generate/stream")
+async def stream_insights(request: InsightsRequest, http_request: Request):
+    if not is_configured():
+        raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY environment variable.")
+    
+    return StreamingResponse(
+        stream_completion(build_insights_completion(request), http_request, request.language),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/quick-summary")
 async def generate_quick_summary(request: InsightsRequest):
-    if not client:
+    if not is_configured():
         raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY environment variable.")
     
     try:
-        analysis = request.analysis_data
-        credit_score = analysis.get("creditworthiness", {}).get("score", 50)
-        credit_grade = analysis.get("creditworthiness", {}).get("grade", "C")
-        
-        if request.language == "hi":
-            prompt = f"""एक SME के लिए जिसका क्रेडिट स्कोर {credit_score}/100 (ग्रेड {credit_grade}) है, 
-            एक 2-वाक्य सारांश दें जो उनकी वित्तीय स्थिति और एक प्राथमिकता कार्रवाई बताता है।"""
-        else:
-            prompt = f"""For an SME with credit score {credit_score}/100 (Grade {credit_grade}), 
-            provide a 2-sentence summary of their financial position and one priority action."""
-        
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a concise financial advisor. Be brief and actionable."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200
-        )
+        result = await complete_cached(build_quick_summary_completion(request))
         
         return {
-            "summary": response.choices[0].message.content,
-            "language": request.language
+            "summary": result["content"],
+            "language": request.language,
+            "cached": result["cached"]
         }
         
+    except LLMBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return insights_cache.stats()
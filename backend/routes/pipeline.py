@@ -0,0 +1,130 @@
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Union, BinaryIO
+import asyncio
+import json
+import time
+
+from auth_middleware import get_current_user
+from columnar import encode_financial_data, series_digest
+from history_store import get_history_store
+from llm_client import is_configured, LLMBusyError
+from routes.analysis import score_cached
+from routes.benchmarks import compare_analysis
+from routes.insights import InsightsRequest, build_insights_completion, complete_cached
+from routes.upload import process_upload, run_upload
+
+router = APIRouter()
+
+# One request runs upload -> analysis -> benchmark -> insights on in-memory
+# objects and streams each stage as an NDJSON line the moment it is ready.
+# The LLM call starts before benchmark comparison, which runs in the
+# threadpool, so the slow stage overlaps everything after scoring.
+
+def ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+def parse_stage(file_content: Union[bytes, BinaryIO], filename: str, fmt: str, user_id: str,
+                content_hash: str) -> tuple:
+    """Parse and record the upload on the parse pool; returns the series, upload_id and the stage's line"""
+    result, cached, upload_id = process_upload(file_content, filename, user_id, content_hash)
+    
+    line = ndjson({
+        "stage": "upload",
+        "upload_id": upload_id,
+        "cached": cached,
+        "summary": result["summary"],
+        "financial_data": encode_financial_data(result["financial_data"], fmt)
+    })
+    return result["financial_data"], upload_id, line
+
+def analysis_stage(financial_data: dict, user_id: str, upload_id: Optional[int], industry: Optional[str]) -> dict:
+    data_hash = series_digest(financial_data)
+    analysis_result = score_cached(financial_data, data_hash)
+    
+    store = get_history_store()
+    if store:
+        analysis_result["analysis_id"] = store.save_analysis(user_id, data_hash, analysis_result, upload_id, industry)
+    return analysis_result
+
+async def pipeline_events(financial_data: dict, upload_id: Optional[int], upload_line: str, user_id: str,
+                          industry: Optional[str], language: str, business_name: Optional[str], insights: bool):
+    started = time.perf_counter()
+    
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+    
+    yield upload_line
+    
+    try:
+        analysis_result = await run_in_threadpool(analysis_stage, financial_data, user_id, upload_id, industry)
+    except Exception as e:
+        yield ndjson({"stage": "analysis", "error": str(e)})
+        return
+    yield ndjson({"stage": "analysis", "elapsed_ms": elapsed_ms(), **analysis_result})
+    
+    insights_task = None
+    if insights and is_configured():
+        insights_task = asyncio.create_task(complete_cached(build_insights_completion(InsightsRequest(
+            analysis_data=analysis_result,
+            language=language,
+            business_name=business_name,
+            industry=industry
+        ))))
+    
+    try:
+        if industry:
+            try:
+                # In the threadpool, so the insights task gets to send its request while this runs
+                benchmark = await run_in_threadpool(compare_analysis, industry, analysis_result)
+                yield ndjson({"stage": "benchmark", "elapsed_ms": elapsed_ms(), **benchmark})
+            except Exception as e:
+                yield ndjson({"stage": "benchmark", "error": str(e)})
+        else:
+            yield ndjson({"stage": "benchmark", "skipped": "No industry given"})
+        
+        if insights_task is not None:
+            try:
+                result = await insights_task
+                yield ndjson({
+                    "stage": "insights",
+                    "elapsed_ms": elapsed_ms(),
+                    "insights": result["content"],
+                    "language": language,
+                    "tokens_used": result["tokens_used"],
+                    "cached": result["cached"]
+                })
+            except LLMBusyError as e:
+                yield ndjson({"stage": "insights", "error": str(e)})
+            except Exception as e:
+                yield ndjson({"stage": "insights", "error": f"Error generating insights: {str(e)}"})
+        elif insights:
+            yield ndjson({"stage": "insights", "error": "AI service not configured. Please set GROQ_API_KEY environment variable."})
+        
+        yield ndjson({"stage": "done", "elapsed_ms": elapsed_ms()})
+    finally:
+        # Client went away or a stage failed; stop paying for tokens nobody will read
+        if insights_task is not None and not insights_task.done():
+            insights_task.cancel()
+
+@router.post("/run")
+async def run_pipeline(
+    file: UploadFile = File(...),
+    # Only analyses the client tagged feed industry benchmarks; without one the benchmark stage is skipped
+    industry: Optional[str] = Form(None),
+    language: str = Form("en"),
+    business_name: Optional[str] = Form(None),
+    insights: bool = Form(True),
+    format: str = Query("json"),
+    user=Depends(get_current_user)
+):
+    """Upload, analyze, benchmark and generate insights in one request, streamed as NDJSON stages"""
+    # Upload errors still surface as HTTP status codes; later stages report errors in-stream
+    financial_data, upload_id, upload_line = await run_upload(file, format, user.id, parse_stage)
+    
+    return StreamingResponse(
+        pipeline_events(financial_data, upload_id, upload_line, user.id, industry, language, business_name, insights),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
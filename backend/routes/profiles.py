@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import hmac
+
+from config import PROFILING_ADMIN_TOKEN, PROFILING_ENABLED
+from profiling import profile_store, to_folded
+
+router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Profiles expose code paths, so they are hidden unless profiling is on and the token matches"""
+    if not PROFILING_ENABLED or not PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not hmac.compare_digest(x_admin_token or "", PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Retained profiles, newest first, without their stacks"""
+    return {"profiles": profile_store.list()}
+
+@router.get("/{request_id}", dependencies=[Depends(require_admin)])
+async def get_profile(request_id: str, format: str = Query("folded")):
+    """One request's profile as folded stacks (flamegraph.pl / speedscope input), or as JSON with format=json"""
+    profile = profile_store.get(request_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return profile
+    return PlainTextResponse(to_folded(profile))
+
+@router.delete("/{request_id}", dependencies=[Depends(require_admin)])
+async def delete_profile(request_id: str):
+    if not profile_store.delete(request_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"deleted": request_id}
+
+@router.delete("", dependencies=[Depends(require_admin)])
+async def clear_profiles():
+    profile_store.clear()
+    return {"deleted": "all"}
@@ -1,105 +1,363 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from typing import BinaryIO, Callable, Optional, Union
+import numpy as np
 import pandas as pd
+import hashlib
 import io
-import json
+import os
+from operator import itemgetter
+from openpyxl import load_workbook
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+from auth_middleware import get_current_user
+from cache import ResultCache, make_key
+from column_matcher import alias_registry
+from columnar import FORMATS, decode_series, encode_financial_data, encode_series
+from config import (
+    MAX_UPLOAD_MB,
+    UPLOAD_CHUNK_BYTES,
+    CSV_CHUNK_ROWS,
+    UPLOAD_CACHE_MAX_ENTRIES,
+    UPLOAD_CACHE_TTL_SECONDS,
+    UPLOAD_CACHE_DB,
+)
+from history_store import get_history_store
+from metrics import timed, upload_bytes
+from parse_pool import run_parse, ParsePoolSaturated, ParseTimeout
 
 router = APIRouter()
 
-EXPECTED_COLUMNS = {
-    "revenue": ["revenue", "sales", "income", "total_revenue", "gross_revenue"],
-    "expenses": ["expenses", "costs", "expenditure", "total_expenses", "operating_expenses"],
-    "cash_inflow": ["cash_inflow", "cash_in", "receipts", "collections", "inflow"],
-    "cash_outflow": ["cash_outflow", "cash_out", "payments", "disbursements", "outflow"],
-    "receivables": ["receivables", "accounts_receivable", "ar", "debtors", "trade_receivables"],
-    "payables": ["payables", "accounts_payable", "ap", "creditors", "trade_payables"],
-    "loans": ["loans", "debt", "borrowings", "loan_balance", "outstanding_loans"],
-    "emi": ["emi", "loan_payment", "installment", "monthly_payment", "repayment"]
-}
+# Parsed results keyed on the upload's content hash, so re-uploading the
+# same export skips parsing entirely
+upload_cache = ResultCache(
+    "uploads",
+    max_entries=UPLOAD_CACHE_MAX_ENTRIES,
+    ttl_seconds=UPLOAD_CACHE_TTL_SECONDS,
+    db_path=UPLOAD_CACHE_DB
+)
 
+@timed("detect_columns")
 def detect_columns(df: pd.DataFrame) -> dict:
-    detected = {}
-    df_columns_lower = [col.lower().replace(" ", "_") for col in df.columns]
+    return alias_registry.detect(df.columns.tolist())
+
+def check_detected_columns(detected_columns: dict):
+    if len(detected_columns) < 3:
+        raise ValueError(
+            "Could not detect enough financial columns. "
+            "Please ensure your file has columns for: revenue, expenses, cash flow, receivables, payables, or loans."
+        )
+
+def to_series(column: pd.Series) -> np.ndarray:
+    return pd.to_numeric(column, errors='coerce').dropna().to_numpy(dtype=np.float64)
+
+def preview_records(df: pd.DataFrame) -> list:
+    # NaN is not valid JSON, so blank cells are previewed as null
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+def process_csv_stream(source: BinaryIO) -> dict:
+    """Parse a CSV in row chunks, materializing only the detected financial columns"""
+    start = source.tell()
+    head = pd.read_csv(source, nrows=5)
+    
+    if head.empty:
+        raise ValueError("The uploaded file is empty.")
+    
+    detected_columns = detect_columns(head)
+    check_detected_columns(detected_columns)
+    
+    source.seek(start)
+    usecols = list(dict.fromkeys(detected_columns.values()))
+    parts = {field: [] for field in detected_columns}
+    total_rows = 0
+    
+    for chunk in pd.read_csv(source, usecols=usecols, chunksize=CSV_CHUNK_ROWS):
+        total_rows += len(chunk)
+        for field, column in detected_columns.items():
+            parts[field].append(to_series(chunk[column]))
+    
+    financial_data = {
+        field: np.concatenate(chunks) if chunks else np.empty(0)
+        for field, chunks in parts.items()
+    }
+    
+    summary = {
+        "total_rows": total_rows,
+        "columns_detected": list(detected_columns.keys()),
+        "column_mapping": detected_columns,
+        "preview": preview_records(head)
+    }
+    
+    return {
+        "success": True,
+        "summary": summary,
+        "financial_data": financial_data
+    }
+
+def excel_engine(filename: str) -> Optional[str]:
+    """Fastest installed reader: calamine when available, else openpyxl for .xlsx.
+    None leaves legacy .xls to pandas' default."""
+    if python_calamine is not None:
+        return "calamine"
+    return "openpyxl" if filename.endswith('.xlsx') else None
+
+def read_xlsx_columns(source: BinaryIO, positions: list) -> tuple:
+    """Stream the first sheet in read-only mode, keeping only the cells at `positions`.
+    Returns (one value tuple per position, data row count)."""
+    workbook = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        # Declared dimensions are unreliable in some exports; read to the real end
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        next(rows, None)
+        
+        width = max(positions) + 1
+        padding = (None,) * width
+        pick = itemgetter(*positions)
+        selected = []
+        total_rows = 0
+        
+        for row in rows:
+            if len(row) < width:
+                row = tuple(row) + padding[len(row):]
+            selected.append(pick(row))
+            # Trailing blank rows are not data (matches pandas' trimming)
+            if row.count(None) + row.count("") < len(row):
+                total_rows = len(selected)
+    finally:
+        workbook.close()
+    
+    del selected[total_rows:]
+    if len(positions) == 1:
+        return [tuple(selected)], total_rows
+    return list(zip(*selected)) or [()] * len(positions), total_rows
+
+def process_excel_stream(source: BinaryIO, filename: str) -> dict:
+    """Parse a workbook's first sheet, materializing only the detected financial columns"""
+    engine = excel_engine(filename)
+    start = source.tell()
+    head = pd.read_excel(source, nrows=5, engine=engine)
+    
+    if head.empty:
+        raise ValueError("The uploaded file is empty.")
+    
+    detected_columns = detect_columns(head)
+    check_detected_columns(detected_columns)
     
-    for field, aliases in EXPECTED_COLUMNS.items():
-        for idx, col in enumerate(df_columns_lower):
-            if col in aliases or any(alias in col for alias in aliases):
-                detected[field] = df.columns[idx]
-                break
+    source.seek(start)
+    usecols = list(dict.fromkeys(detected_columns.values()))
     
-    return detected
+    if engine == "openpyxl":
+        values, total_rows = read_xlsx_columns(source, [head.columns.get_loc(column) for column in usecols])
+        columns = {column: pd.Series(column_values, dtype=object) for column, column_values in zip(usecols, values)}
+    else:
+        df = pd.read_excel(source, usecols=usecols, engine=engine)
+        total_rows = len(df)
+        columns = {column: df[column] for column in usecols}
+    
+    financial_data = {
+        field: to_series(columns[column])
+        for field, column in detected_columns.items()
+    }
+    
+    summary = {
+        "total_rows": total_rows,
+        "columns_detected": list(detected_columns.keys()),
+        "column_mapping": detected_columns,
+        "preview": preview_records(head)
+    }
+    
+    return {
+        "success": True,
+        "summary": summary,
+        "financial_data": financial_data
+    }
 
-def validate_and_process_file(file_content: bytes, filename: str) -> dict:
+@timed("validate_and_process_file")
+def validate_and_process_file(file_content: Union[bytes, BinaryIO], filename: str) -> dict:
+    """Parse an upload into its summary and detected series (float64 NumPy arrays)"""
     try:
+        source = io.BytesIO(file_content) if isinstance(file_content, (bytes, bytearray)) else file_content
+        
         if filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
+            return process_csv_stream(source)
         elif filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(file_content))
+            return process_excel_stream(source, filename)
         else:
             raise ValueError("Unsupported file format. Please upload CSV or XLSX files.")
-        
-        if df.empty:
-            raise ValueError("The uploaded file is empty.")
-        
-        detected_columns = detect_columns(df)
-        
-        if len(detected_columns) < 3:
-            raise ValueError(
-                "Could not detect enough financial columns. "
-                "Please ensure your file has columns for: revenue, expenses, cash flow, receivables, payables, or loans."
-            )
-        
-        financial_data = {}
-        for field, column in detected_columns.items():
-            values = pd.to_numeric(df[column], errors='coerce').dropna().tolist()
-            financial_data[field] = values
-        
-        summary = {
-            "total_rows": len(df),
-            "columns_detected": list(detected_columns.keys()),
-            "column_mapping": detected_columns,
-            "preview": df.head(5).to_dict(orient='records')
-        }
-        
-        return {
-            "success": True,
-            "summary": summary,
-            "financial_data": financial_data,
-            "raw_data": df.to_dict(orient='records')
-        }
-        
+    
     except Exception as e:
         raise ValueError(str(e))
 
-@router.post("/file")
-async def upload_file(file: UploadFile = File(...)):
-    """Process uploaded financial file - no authentication required"""
+def process_file_cached(file_content: Union[bytes, BinaryIO], filename: str, content_hash: str) -> tuple:
+    """validate_and_process_file behind upload_cache; returns (result, cache hit)"""
+    key = make_key("upload", content_hash, os.path.splitext(filename)[1], alias_registry.signature)
+    cached = upload_cache.get(key)
+    if cached is not None:
+        financial_data = {field: decode_series(encoded) for field, encoded in cached["financial_data"].items()}
+        return {"success": True, "summary": cached["summary"], "financial_data": financial_data}, True
+    
+    result = validate_and_process_file(file_content, filename)
+    upload_cache.set(key, {
+        "summary": result["summary"],
+        "financial_data": {field: encode_series(values) for field, values in result["financial_data"].items()}
+    })
+    return result, False
+
+def process_upload(file_content: Union[bytes, BinaryIO], filename: str, user_id: str, content_hash: str) -> tuple:
+    """Parse (or reuse) and record an upload; returns (result, cache hit, upload_id)"""
+    result, cached = process_file_cached(file_content, filename, content_hash)
+    
+    store = get_history_store()
+    upload_id = store.save_upload(user_id, filename, result["summary"], result["financial_data"]) if store else None
+    return result, cached, upload_id
+
+def build_upload_response(file_content: Union[bytes, BinaryIO], filename: str, fmt: str, user_id: str,
+                          content_hash: str) -> JSONResponse:
+    """Parse, record and render the response body on the parse pool, off the event loop"""
+    result, cached, upload_id = process_upload(file_content, filename, user_id, content_hash)
+    
+    # Body is already plain JSON types, so skip FastAPI's per-element jsonable_encoder walk
+    return JSONResponse({
+        "message": "File processed successfully",
+        "upload_id": upload_id,
+        "cached": cached,
+        "summary": result["summary"],
+        "financial_data": encode_financial_data(result["financial_data"], fmt)
+    })
+
+# Room for multipart boundaries and the other form fields next to the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+class UploadLimitMiddleware:
+    """Stop upload bodies past MAX_UPLOAD_MB before Starlette spools them: from Content-Length
+    up front, or while the body streams in when the length is missing or wrong"""
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = MAX_UPLOAD_MB * 1024 * 1024 + FORM_OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        
+        detail = f"File size exceeds {MAX_UPLOAD_MB}MB limit."
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+        
+        received = 0
+
+        async def capped_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised while the form is being parsed, so FastAPI answers it like any HTTPException
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, capped_receive, send)
+
+async def spool_upload(file: UploadFile) -> str:
+    """Hash the spooled upload in chunks and enforce MAX_UPLOAD_MB on the file itself
+    (UploadLimitMiddleware has already capped the whole body). Returns the SHA-256 of the content."""
+    size = 0
+    digest = hashlib.sha256()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_UPLOAD_MB * 1024 * 1024:
+            raise HTTPException(status_code=413, detail=f"File size exceeds {MAX_UPLOAD_MB}MB limit.")
+        digest.update(chunk)
+    upload_bytes.inc(size)
+    await file.seek(0)
+    return digest.hexdigest()
+
+async def run_upload(file: UploadFile, fmt: str, user_id: str, handler: Callable):
+    """Validate and spool an upload, then run handler(file, filename, fmt, user_id, content_hash)
+    on the parse pool, mapping failures to HTTP errors"""
     try:
+        if fmt not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(FORMATS)}.")
+        
         if not file.filename.endswith(('.csv', '.xlsx', '.xls')):
             raise HTTPException(
                 status_code=400, 
                 detail="Invalid file format. Please upload CSV or XLSX files."
             )
         
-        content = await file.read()
-        
-        if len(content) > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File size exceeds 10MB limit.")
-        
-        result = validate_and_process_file(content, file.filename)
-        
-        return {
-            "message": "File processed successfully",
-            "summary": result["summary"],
-            "financial_data": result["financial_data"]
-        }
+        content_hash = await spool_upload(file)
         
+        return await run_parse(handler, file.file, file.filename, fmt, user_id, content_hash)
+    
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ParsePoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except ParseTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+@router.post("/file")
+async def upload_file(file: UploadFile = File(...), format: str = Query("json"), user=Depends(get_current_user)):
+    """Process an uploaded financial file for the current user"""
+    return await run_upload(file, format, user.id, build_upload_response)
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return upload_cache.stats()
+
 @router.get("/history")
-async def get_upload_history():
-    """No database - return empty history"""
-    return {"uploads": [], "message": "Upload history is stored locally only"}
+def get_upload_history(
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user)
+):
+    """Most recent uploads first; pass next_cursor back to fetch the next page"""
+    store = get_history_store()
+    if not store:
+        return {"uploads": [], "next_cursor": None}
+    
+    try:
+        uploads, next_cursor = store.list_uploads(user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"uploads": uploads, "next_cursor": next_cursor}
+
+@router.get("/history/{upload_id}")
+def get_upload(upload_id: int, format: str = Query("json"), user=Depends(get_current_user)):
+    """Reload a past upload's summary and series without re-sending the file"""
+    store = get_history_store()
+    upload = store.get_upload(user.id, upload_id) if store else None
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(FORMATS)}.")
+    
+    try:
+        financial_data = encode_financial_data(upload["financial_data"], format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return JSONResponse({
+        "upload_id": upload["id"],
+        "created_at": upload["created_at"],
+        "filename": upload["filename"],
+        "summary": upload["summary"],
+        "financial_data": financial_data
+    })
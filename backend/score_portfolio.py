@@ -0,0 +1,176 @@
+# Portfolio scoring CLI
+# Scores a directory (or glob) of CSV/XLSX files with the same ingestion,
+# scoring and benchmark logic as the API, spread across a process pool.
+# Results are appended to a checkpoint CSV as files finish, so an
+# interrupted run picks up where it left off when re-run.
+#
+#   cd backend
+#   python score_portfolio.py ../exports/ --output results.csv --industry retail
+#   python score_portfolio.py "../exports/**/*.xlsx" --output results.parquet
+
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Iterable, List
+
+from routes.benchmarks import compare_analysis
+from routes.upload import validate_and_process_file
+from scoring import score_financial_data
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+RESULT_FIELDS = [
+    "file", "status", "error", "total_rows", "columns_detected",
+    "grade", "credit_score", "overall_health",
+    "cash_flow_score", "cash_flow_status",
+    "expense_ratio_score", "expense_ratio", "expense_ratio_status",
+    "working_capital_score", "working_capital_gap", "working_capital_status",
+    "debt_burden_score", "debt_to_revenue", "debt_burden_status",
+    "industry", "benchmark_status", "benchmark_better_metrics",
+    "expense_ratio_vs_industry", "cash_flow_stability_vs_industry",
+    "working_capital_gap_vs_industry", "debt_to_revenue_vs_industry"
+]
+
+def collect_files(inputs: Iterable[str], recursive: bool) -> List[str]:
+    files = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pattern = "**/*" if recursive else "*"
+            candidates = path.glob(pattern)
+        else:
+            candidates = (Path(match) for match in glob.glob(item, recursive=True))
+        for candidate in candidates:
+            if candidate.is_file() and candidate.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                files.add(str(candidate.resolve()))
+    return sorted(files)
+
+def score_file(path: str, industry: str) -> dict:
+    """Ingest, score and benchmark one file; failures become an error row"""
+    row = {"file": path, "industry": industry}
+    try:
+        with open(path, "rb") as source:
+            processed = validate_and_process_file(source, os.path.basename(path).lower())
+        
+        analysis = score_financial_data(processed["financial_data"])
+        comparison = compare_analysis(industry, analysis)
+        
+        row.update({
+            "status": "ok",
+            "total_rows": processed["summary"]["total_rows"],
+            "columns_detected": ";".join(processed["summary"]["columns_detected"]),
+            "grade": analysis["creditworthiness"]["grade"],
+            "credit_score": analysis["creditworthiness"]["score"],
+            "overall_health": analysis["overall_health"],
+            "cash_flow_score": analysis["cash_flow_stability"]["score"],
+            "cash_flow_status": analysis["cash_flow_stability"]["status"],
+            "expense_ratio_score": analysis["expense_ratio"]["score"],
+            "expense_ratio": analysis["expense_ratio"]["ratio"],
+            "expense_ratio_status": analysis["expense_ratio"]["status"],
+            "working_capital_score": analysis["working_capital"]["score"],
+            "working_capital_gap": analysis["working_capital"]["gap"],
+            "working_capital_status": analysis["working_capital"]["status"],
+            "debt_burden_score": analysis["debt_burden"]["score"],
+            "debt_to_revenue": analysis["debt_burden"].get("debt_to_revenue", ""),
+            "debt_burden_status": analysis["debt_burden"]["status"],
+            "industry": comparison["industry"],
+            "benchmark_status": comparison["overall_status"],
+            "benchmark_better_metrics": comparison["better_metrics"]
+        })
+        for metric, result in comparison["comparisons"].items():
+            row[f"{metric}_vs_industry"] = result["status"]
+    except Exception as e:
+        row.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    return row
+
+def load_checkpoint(checkpoint_path: str) -> set:
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, newline="", encoding="utf-8") as f:
+        return {row["file"] for row in csv.DictReader(f)}
+
+def report_progress(done: int, total: int, errors: int, started: float):
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed > 0 else 0
+    eta = (total - done) / rate if rate > 0 else 0
+    print(
+        f"\r[{done}/{total}] {done / total * 100:5.1f}%  {rate:6.1f} files/s  "
+        f"errors: {errors}  eta: {int(eta // 60)}m{int(eta % 60):02d}s",
+        end="", file=sys.stderr, flush=True
+    )
+
+def write_parquet(checkpoint_path: str, output_path: str):
+    import pandas as pd
+    pd.read_csv(checkpoint_path).to_parquet(output_path, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a portfolio of financial files")
+    parser.add_argument("inputs", nargs="+", help="Directories, files or glob patterns")
+    parser.add_argument("--output", "-o", default="portfolio_results.csv", help="Results file (.csv or .parquet)")
+    parser.add_argument("--industry", default="services", help="Industry to benchmark against")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--recursive", "-r", action="store_true", help="Descend into subdirectories")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Flush results to disk every N files")
+    args = parser.parse_args()
+    
+    to_parquet = args.output.endswith(".parquet")
+    checkpoint_path = args.output + ".checkpoint.csv" if to_parquet else args.output
+    
+    files = collect_files(args.inputs, args.recursive)
+    done_files = load_checkpoint(checkpoint_path)
+    pending = [path for path in files if path not in done_files]
+    print(f"{len(files)} files found, {len(files) - len(pending)} already scored, {len(pending)} to go", file=sys.stderr)
+    
+    is_new = not os.path.exists(checkpoint_path)
+    with open(checkpoint_path, "a", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS)
+        if is_new:
+            writer.writeheader()
+        
+        done, errors, since_flush = 0, 0, 0
+        started = last_report = time.monotonic()
+        queue = iter(pending)
+        
+        # Keep a bounded window of submitted files rather than queuing all of them
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            in_flight = set()
+            while True:
+                while len(in_flight) < args.workers * 4:
+                    path = next(queue, None)
+                    if path is None:
+                        break
+                    in_flight.add(executor.submit(score_file, path, args.industry))
+                if not in_flight:
+                    break
+                
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    row = future.result()
+                    writer.writerow(row)
+                    done += 1
+                    since_flush += 1
+                    errors += row["status"] == "error"
+                
+                if since_flush >= args.checkpoint_every:
+                    out.flush()
+                    os.fsync(out.fileno())
+                    since_flush = 0
+                if time.monotonic() - last_report >= 0.5 or not in_flight:
+                    report_progress(done, len(pending), errors, started)
+                    last_report = time.monotonic()
+    
+    if pending:
+        print(file=sys.stderr)
+    
+    if to_parquet:
+        write_parquet(checkpoint_path, args.output)
+    
+    print(f"Scored {done} files ({errors} errors) -> {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
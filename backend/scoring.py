@@ -0,0 +1,388 @@
+# Financial health scoring
+# Metric thresholds and result builders shared by every scoring path, plus
+# the NumPy engine behind /api/analysis/calculate. The list-based
+# calculate_* functions in routes/analysis.py remain the reference
+# implementation; the engine reproduces their output exactly.
+
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import timed
+
+SERIES_FIELDS = ["revenue", "expenses", "cash_inflow", "cash_outflow", "receivables", "payables", "loans", "emi"]
+
+# Status bands - each metric maps its value onto the first matching band.
+# Score bands match on value >= threshold, ratio bands on value < upper bound;
+# the last band catches everything else.
+CASH_FLOW_BANDS = [
+    (70, "healthy", "Your cash flow is stable with consistent positive net flows."),
+    (50, "moderate", "Your cash flow shows some variability. Consider building cash reserves."),
+    (float("-inf"), "at_risk", "Your cash flow is unstable. Immediate attention to cash management is needed.")
+]
+
+EXPENSE_RATIO_BANDS = [
+    (60, 100, "excellent", "Excellent expense management! Your expenses are {ratio:.1f}% of revenue."),
+    (75, 80, "healthy", "Good expense control. Expenses at {ratio:.1f}% of revenue."),
+    (90, 60, "moderate", "Expenses at {ratio:.1f}% of revenue. Look for cost optimization opportunities."),
+    (100, 40, "warning", "High expenses at {ratio:.1f}% of revenue. Profitability is at risk."),
+    (float("inf"), 20, "critical", "Expenses exceed revenue at {ratio:.1f}%. Urgent cost reduction needed.")
+]
+
+WORKING_CAPITAL_BANDS = [
+    (0, 90, "excellent", "You collect faster than you pay. Strong working capital position."),
+    (0.5, 70, "healthy", "Balanced working capital. Collections and payments are well managed."),
+    (1, 50, "moderate", "Working capital gap is widening. Consider faster collection strategies."),
+    (float("inf"), 30, "at_risk", "Significant working capital gap. May face cash flow issues.")
+]
+
+DEBT_BURDEN_BANDS = [
+    (15, 95, "excellent", "Very low debt burden. Strong financial position."),
+    (30, 80, "healthy", "Manageable debt levels. Good capacity for growth."),
+    (50, 60, "moderate", "Moderate debt burden. Be cautious with additional borrowing."),
+    (70, 40, "warning", "High debt burden. Focus on debt reduction."),
+    (float("inf"), 20, "critical", "Very high debt burden. Debt restructuring may be needed.")
+]
+
+CREDIT_GRADE_BANDS = [
+    (80, "A", "excellent", "Excellent creditworthiness. Eligible for best loan terms."),
+    (65, "B", "good", "Good creditworthiness. Eligible for competitive loan products."),
+    (50, "C", "fair", "Fair creditworthiness. Some loan products may be available."),
+    (35, "D", "poor", "Below average creditworthiness. Limited financing options."),
+    (float("-inf"), "E", "very_poor", "Poor creditworthiness. Consider improving finances before applying for credit.")
+]
+
+CREDIT_WEIGHTS = {
+    "cash_flow_stability": 0.25,
+    "expense_ratio": 0.20,
+    "working_capital": 0.20,
+    "debt_burden": 0.35
+}
+
+INSUFFICIENT_DATA = {
+    "cash_flow_stability": {"score": 50, "status": "unknown", "explanation": "Insufficient cash flow data"},
+    "expense_ratio": {"score": 50, "ratio": 0, "status": "unknown", "explanation": "Insufficient data"},
+    "working_capital": {"score": 50, "gap": 0, "status": "unknown", "explanation": "Insufficient data"},
+    "debt_burden": {"score": 50, "ratio": 0, "status": "unknown", "explanation": "Insufficient data"}
+}
+
+def band_at_least(value: float, bands: list) -> tuple:
+    for band in bands[:-1]:
+        if value >= band[0]:
+            return band
+    return bands[-1]
+
+def band_below(value: float, bands: list) -> tuple:
+    for band in bands[:-1]:
+        if value < band[0]:
+            return band
+    return bands[-1]
+
+def score_cash_flow_stability(stability_ratio: float, cv: float) -> dict:
+    score = min(100, max(0, int((stability_ratio * 60) + ((1 - min(cv, 1)) * 40))))
+    _, status, explanation = band_at_least(score, CASH_FLOW_BANDS)
+    return {"score": score, "status": status, "explanation": explanation}
+
+def score_expense_ratio(total_revenue: float, total_expenses: float) -> dict:
+    if total_revenue == 0:
+        return {"score": 0, "ratio": 100, "status": "critical", "explanation": "No revenue recorded"}
+    
+    ratio = (total_expenses / total_revenue) * 100
+    _, score, status, explanation = band_below(ratio, EXPENSE_RATIO_BANDS)
+    
+    return {"score": score, "ratio": round(ratio, 2), "status": status, "explanation": explanation.format(ratio=ratio)}
+
+def score_working_capital_gap(avg_receivables: float, avg_payables: float) -> dict:
+    gap = avg_receivables - avg_payables
+    
+    if avg_payables > 0:
+        gap_ratio = gap / avg_payables
+    else:
+        gap_ratio = 0
+    
+    _, score, status, explanation = band_below(gap_ratio, WORKING_CAPITAL_BANDS)
+    
+    return {"score": score, "gap": round(gap, 2), "status": status, "explanation": explanation}
+
+def score_debt_burden(total_revenue: float, total_loans: float, total_emi: float) -> dict:
+    if total_revenue == 0:
+        return {"score": 0, "ratio": 100, "status": "critical", "explanation": "No revenue to service debt"}
+    
+    debt_service_ratio = (total_emi / total_revenue) * 100 if total_emi else 0
+    debt_to_revenue = (total_loans / total_revenue) * 100 if total_loans else 0
+    
+    combined_ratio = (debt_service_ratio * 0.6) + (min(debt_to_revenue, 100) * 0.4)
+    _, score, status, explanation = band_below(combined_ratio, DEBT_BURDEN_BANDS)
+    
+    return {
+        "score": score, 
+        "debt_service_ratio": round(debt_service_ratio, 2),
+        "debt_to_revenue": round(debt_to_revenue, 2),
+        "status": status, 
+        "explanation": explanation
+    }
+
+def calculate_creditworthiness(scores: dict) -> dict:
+    weighted_score = sum(
+        scores.get(metric, {}).get("score", 50) * weight 
+        for metric, weight in CREDIT_WEIGHTS.items()
+    )
+    
+    final_score = min(100, max(0, int(weighted_score)))
+    _, grade, status, explanation = band_at_least(final_score, CREDIT_GRADE_BANDS)
+    
+    return {
+        "score": final_score,
+        "grade": grade,
+        "status": status,
+        "explanation": explanation
+    }
+
+if sys.version_info >= (3, 12):
+    def seq_sum(values: np.ndarray) -> float:
+        """Builtin sum() - from 3.12 it compensates float rounding, so defer to it"""
+        return sum(values.tolist())
+    
+    def group_seq_sum(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+        order = np.argsort(groups, kind="stable")
+        bounds = np.searchsorted(groups[order], np.arange(n_groups + 1))
+        ordered = values[order].tolist()
+        return np.array([sum(ordered[bounds[i]:bounds[i + 1]]) for i in range(n_groups)], dtype=np.float64)
+else:
+    def seq_sum(values: np.ndarray) -> float:
+        """Left-to-right float sum, bit-identical to builtin sum() on the same list"""
+        # sum() starts from 0, which turns a leading -0.0 into 0.0
+        return 0.0 + float(np.cumsum(values)[-1]) if values.size else 0
+    
+    def group_seq_sum(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+        """Per-group seq_sum - bincount accumulates each bin from 0.0 in input order"""
+        return np.bincount(groups, weights=values, minlength=n_groups)
+
+def as_series(values: Optional[Sequence[float]]) -> np.ndarray:
+    if values is None:
+        return np.empty(0)
+    return np.asarray(values, dtype=np.float64)
+
+def near_score_boundary(stability_ratio: float, avg_inflow: float, variance: float) -> bool:
+    """True when the cash flow score is within rounding noise of an integer"""
+    if avg_inflow <= 0:
+        return False
+    cv = (variance ** 0.5) / avg_inflow
+    raw_score = (stability_ratio * 60) + ((1 - min(cv, 1)) * 40)
+    return abs(raw_score - round(raw_score)) < 1e-9
+
+def exact_inflow_variance(inflow: np.ndarray, avg_inflow: float) -> float:
+    return sum((cf - avg_inflow) ** 2 for cf in inflow.tolist()) / inflow.size
+
+def inflow_variance(inflow: np.ndarray, avg_inflow: float, stability_ratio: float) -> float:
+    deviations = inflow - avg_inflow
+    variance = seq_sum(deviations * deviations) / inflow.size
+    
+    # d * d is exactly rounded but Python's d ** 2 goes through libm pow,
+    # which can differ in the last bit. That only matters if the score
+    # sits right on an integer boundary - recompute exactly in that case.
+    if near_score_boundary(stability_ratio, avg_inflow, variance):
+        variance = exact_inflow_variance(inflow, avg_inflow)
+    return variance
+
+def score_aggregates(counts: Dict[str, int], totals: Dict[str, float],
+                     positive_months: int = 0, inflow_var: float = 0.0) -> dict:
+    """Build the full analysis result from per-series counts and sums"""
+    if counts["cash_inflow"] and counts["cash_outflow"]:
+        periods = min(counts["cash_inflow"], counts["cash_outflow"])
+        avg_inflow = totals["cash_inflow"] / counts["cash_inflow"]
+        cv = (inflow_var ** 0.5) / avg_inflow if avg_inflow > 0 else 1
+        cash_flow_stability = score_cash_flow_stability(positive_months / periods, cv)
+    else:
+        cash_flow_stability = dict(INSUFFICIENT_DATA["cash_flow_stability"])
+    
+    if counts["revenue"] and counts["expenses"]:
+        expense_ratio = score_expense_ratio(totals["revenue"], totals["expenses"])
+    else:
+        expense_ratio = dict(INSUFFICIENT_DATA["expense_ratio"])
+    
+    if counts["receivables"] and counts["payables"]:
+        working_capital = score_working_capital_gap(
+            totals["receivables"] / counts["receivables"],
+            totals["payables"] / counts["payables"]
+        )
+    else:
+        working_capital = dict(INSUFFICIENT_DATA["working_capital"])
+    
+    if counts["revenue"]:
+        debt_burden = score_debt_burden(totals["revenue"], totals["loans"], totals["emi"])
+    else:
+        debt_burden = dict(INSUFFICIENT_DATA["debt_burden"])
+    
+    all_scores = {
+        "cash_flow_stability": cash_flow_stability,
+        "expense_ratio": expense_ratio,
+        "working_capital": working_capital,
+        "debt_burden": debt_burden
+    }
+    
+    creditworthiness = calculate_creditworthiness(all_scores)
+    
+    return {
+        "cash_flow_stability": cash_flow_stability,
+        "expense_ratio": expense_ratio,
+        "working_capital": working_capital,
+        "debt_burden": debt_burden,
+        "creditworthiness": creditworthiness,
+        "overall_health": creditworthiness["status"]
+    }
+
+@timed("score_financial_data")
+def score_financial_data(financial_data: Dict[str, Optional[Sequence[float]]]) -> dict:
+    """Score all metrics and creditworthiness in one pass over float64 arrays"""
+    series = {field: as_series(financial_data.get(field)) for field in SERIES_FIELDS}
+    counts = {field: int(values.size) for field, values in series.items()}
+    totals = {field: seq_sum(values) if values.size else 0 for field, values in series.items()}
+    
+    inflow, outflow = series["cash_inflow"], series["cash_outflow"]
+    positive_months, inflow_var = 0, 0.0
+    
+    if inflow.size and outflow.size:
+        periods = min(inflow.size, outflow.size)
+        positive_months = int(np.count_nonzero((inflow[:periods] - outflow[:periods]) > 0))
+        avg_inflow = totals["cash_inflow"] / inflow.size
+        inflow_var = inflow_variance(inflow, avg_inflow, positive_months / periods)
+    
+    return score_aggregates(counts, totals, positive_months, inflow_var)
+
+def group_order(groups: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Stable sort by group, returning (order, group bounds, position within group)"""
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    bounds = np.searchsorted(sorted_groups, np.arange(n_groups + 1))
+    positions = np.arange(groups.size) - bounds[sorted_groups]
+    return order, bounds, positions
+
+@timed("score_batch")
+def score_batch(series: Dict[str, Tuple[np.ndarray, np.ndarray]], n_groups: int) -> List[dict]:
+    """Score many businesses at once
+    
+    series maps each field to (values, group ids), with each business's
+    values in period order. Results match score_financial_data per business.
+    """
+    empty = (np.empty(0), np.empty(0, dtype=np.intp))
+    counts, totals = {}, {}
+    for field in SERIES_FIELDS:
+        values, groups = series.get(field, empty)
+        counts[field] = np.bincount(groups, minlength=n_groups)
+        totals[field] = group_seq_sum(values, groups, n_groups)
+    
+    # Pair inflow[i] with outflow[i] within each business, like zip()
+    inflow, inflow_groups = series.get("cash_inflow", empty)
+    outflow, outflow_groups = series.get("cash_outflow", empty)
+    periods = np.minimum(counts["cash_inflow"], counts["cash_outflow"])
+    
+    in_order, in_bounds, in_positions = group_order(inflow_groups, n_groups)
+    out_order, _, out_positions = group_order(outflow_groups, n_groups)
+    sorted_inflow = inflow[in_order]
+    in_paired = in_positions < periods[inflow_groups[in_order]]
+    out_paired = out_positions < periods[outflow_groups[out_order]]
+    net_positive = (sorted_inflow[in_paired] - outflow[out_order][out_paired]) > 0
+    positive_months = np.bincount(inflow_groups[in_order][in_paired], weights=net_positive, minlength=n_groups)
+    
+    inflow_counts = counts["cash_inflow"]
+    avg_inflow = np.divide(totals["cash_inflow"], inflow_counts,
+                           out=np.zeros(n_groups), where=inflow_counts > 0)
+    deviations = inflow - avg_inflow[inflow_groups]
+    inflow_var = np.divide(group_seq_sum(deviations * deviations, inflow_groups, n_groups), inflow_counts,
+                           out=np.zeros(n_groups), where=inflow_counts > 0)
+    
+    results = []
+    for i in range(n_groups):
+        group_counts = {field: int(counts[field][i]) for field in SERIES_FIELDS}
+        group_totals = {
+            field: float(totals[field][i]) if group_counts[field] else 0
+            for field in SERIES_FIELDS
+        }
+        variance = float(inflow_var[i])
+        if periods[i]:
+            avg = float(avg_inflow[i])
+            if near_score_boundary(int(positive_months[i]) / int(periods[i]), avg, variance):
+                variance = exact_inflow_variance(sorted_inflow[in_bounds[i]:in_bounds[i + 1]], avg)
+        results.append(score_aggregates(group_counts, group_totals, int(positive_months[i]), variance))
+    
+    return results
+
+def band_index_at_least(values: np.ndarray, bands: list) -> np.ndarray:
+    """Vectorized band_at_least: index of the first band whose threshold values reach"""
+    thresholds = np.array([band[0] for band in bands[:-1]])
+    return thresholds.size - np.searchsorted(thresholds[::-1], values, side="right")
+
+def band_index_below(values: np.ndarray, bands: list) -> np.ndarray:
+    """Vectorized band_below: index of the first band whose bound values fall under"""
+    bounds = np.array([band[0] for band in bands[:-1]])
+    return np.searchsorted(bounds, values, side="right")
+
+def band_scores(bands: list, index: np.ndarray) -> np.ndarray:
+    return np.array([band[1] for band in bands])[index]
+
+def score_aggregate_columns(counts: Dict[str, np.ndarray], totals: Dict[str, np.ndarray],
+                            positive_months: np.ndarray, inflow_var: np.ndarray) -> Dict[str, np.ndarray]:
+    """score_aggregates over arrays of aggregates, one element per window"""
+    def ratio(numerator, denominator, mask, fill=0.0):
+        return np.divide(numerator, denominator, out=np.full(numerator.shape, fill), where=mask)
+    
+    has_cash_flow = (counts["cash_inflow"] > 0) & (counts["cash_outflow"] > 0)
+    periods = np.minimum(counts["cash_inflow"], counts["cash_outflow"])
+    stability_ratio = ratio(positive_months, periods, has_cash_flow)
+    avg_inflow = ratio(totals["cash_inflow"], counts["cash_inflow"], counts["cash_inflow"] > 0)
+    cv = ratio(np.sqrt(inflow_var), avg_inflow, avg_inflow > 0, fill=1.0)
+    raw = (stability_ratio * 60) + ((1 - np.minimum(cv, 1)) * 40)
+    cash_flow = np.where(has_cash_flow, np.clip(np.trunc(raw), 0, 100), INSUFFICIENT_DATA["cash_flow_stability"]["score"])
+    
+    revenue, expenses = totals["revenue"], totals["expenses"]
+    has_revenue = counts["revenue"] > 0
+    has_expenses = has_revenue & (counts["expenses"] > 0)
+    expense_ratio = np.where(revenue != 0, ratio(expenses, revenue, revenue != 0) * 100, 100)
+    expense_score = np.where(revenue != 0, band_scores(EXPENSE_RATIO_BANDS, band_index_below(expense_ratio, EXPENSE_RATIO_BANDS)), 0)
+    expense_score = np.where(has_expenses, expense_score, INSUFFICIENT_DATA["expense_ratio"]["score"])
+    expense_ratio = np.where(has_expenses, expense_ratio, INSUFFICIENT_DATA["expense_ratio"]["ratio"])
+    
+    has_working_capital = (counts["receivables"] > 0) & (counts["payables"] > 0)
+    avg_receivables = ratio(totals["receivables"], counts["receivables"], counts["receivables"] > 0)
+    avg_payables = ratio(totals["payables"], counts["payables"], counts["payables"] > 0)
+    gap = avg_receivables - avg_payables
+    gap_ratio = ratio(gap, avg_payables, avg_payables > 0)
+    working_capital = np.where(
+        has_working_capital,
+        band_scores(WORKING_CAPITAL_BANDS, band_index_below(gap_ratio, WORKING_CAPITAL_BANDS)),
+        INSUFFICIENT_DATA["working_capital"]["score"]
+    )
+    gap = np.where(has_working_capital, gap, INSUFFICIENT_DATA["working_capital"]["gap"])
+    
+    debt_service_ratio = np.where(totals["emi"] != 0, ratio(totals["emi"], revenue, revenue != 0) * 100, 0)
+    debt_to_revenue = np.where(totals["loans"] != 0, ratio(totals["loans"], revenue, revenue != 0) * 100, 0)
+    combined_ratio = (debt_service_ratio * 0.6) + (np.minimum(debt_to_revenue, 100) * 0.4)
+    debt_burden = np.where(revenue != 0, band_scores(DEBT_BURDEN_BANDS, band_index_below(combined_ratio, DEBT_BURDEN_BANDS)), 0)
+    debt_burden = np.where(has_revenue, debt_burden, INSUFFICIENT_DATA["debt_burden"]["score"])
+    
+    metric_scores = {
+        "cash_flow_stability": cash_flow,
+        "expense_ratio": expense_score,
+        "working_capital": working_capital,
+        "debt_burden": debt_burden
+    }
+    # Accumulate in CREDIT_WEIGHTS order, like the sum() in calculate_creditworthiness
+    weighted_score = 0
+    for metric, weight in CREDIT_WEIGHTS.items():
+        weighted_score = weighted_score + metric_scores[metric] * weight
+    credit_score = np.clip(np.trunc(weighted_score), 0, 100).astype(np.int64)
+    grades = np.array([band[1] for band in CREDIT_GRADE_BANDS])[band_index_at_least(credit_score, CREDIT_GRADE_BANDS)]
+    
+    return {
+        **{metric: values.astype(np.int64) for metric, values in metric_scores.items()},
+        "creditworthiness": credit_score,
+        "grade": grades,
+        "expense_ratio_percent": expense_ratio,
+        "working_capital_gap": gap,
+        # Pre-band values, for callers checking how close each window sits to a band edge
+        "cash_flow_raw": raw,
+        "gap_ratio": gap_ratio,
+        "debt_combined_ratio": combined_ratio
+    }
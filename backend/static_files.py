@@ -0,0 +1,126 @@
+# Static SPA serving
+# The frontend build (dist/public) is scanned once at startup into a
+# manifest of URL path -> asset, so serving a request is a dict lookup
+# with no exists()/stat() calls. index.html and files up to
+# STATIC_MEMORY_MAX_BYTES are held in memory with their gzip/brotli
+# variants. Variants come from prebuilt .gz/.br siblings when the build
+# emits them; otherwise compressible types are compressed at load. Larger
+# files are streamed from disk, using the stat result taken at scan time.
+# Vite fingerprints everything under assets/, so those files are cached
+# as immutable. Everything else revalidates by ETag. A new build means a
+# new deploy and so a restart, which rescans the directory.
+
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from http_cache import PrecompressedBody, encoding_etags, etag_matches, negotiate_encoding
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+PRECOMPRESSED_SUFFIXES = {".br": "br", ".gz": "gzip"}
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/wasm",
+    "application/xml",
+    "image/svg+xml"
+}
+
+def media_type_for(path: Path) -> str:
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+class DiskAsset:
+    """A file too large to keep in memory, streamed by FileResponse from its scanned path and stat"""
+
+    def __init__(self, paths: Dict[str, Path], media_type: str, cache_control: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.files = {encoding: (path, os.stat(path)) for encoding, path in paths.items()}
+        self.etags = encoding_etags(file_digest(paths["identity"]), paths)
+
+    def respond(self, request: Request) -> Response:
+        encoding = negotiate_encoding(request, self.files)
+        headers = {"ETag": self.etags[encoding], "Cache-Control": self.cache_control}
+        if len(self.files) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        # Only the variant being served validates; a cached gzip body is no good to an identity-only client
+        if etag_matches(request, self.etags[encoding]):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        path, stat_result = self.files[encoding]
+        return FileResponse(path, media_type=self.media_type, headers=headers, stat_result=stat_result)
+
+Asset = Union[PrecompressedBody, DiskAsset]
+
+class StaticSite:
+    """Manifest of a built frontend directory, answering SPA routes with index.html"""
+
+    def __init__(self, root: Path, memory_max_bytes: int):
+        self.root = root
+        self.memory_max_bytes = memory_max_bytes
+        self.assets: Dict[str, Asset] = {}
+        self.memory_bytes = 0
+        self.scan()
+        self.index: Optional[Asset] = self.assets.get("index.html")
+
+    def scan(self):
+        files = sorted(path for path in self.root.rglob("*") if path.is_file())
+        present = set(files)
+        for path in files:
+            # foo.js.gz next to foo.js is a variant of it, not an asset of its own
+            if path.suffix in PRECOMPRESSED_SUFFIXES and path.with_suffix("") in present:
+                continue
+            variants = {
+                encoding: path.with_name(path.name + suffix)
+                for suffix, encoding in PRECOMPRESSED_SUFFIXES.items()
+                if path.with_name(path.name + suffix) in present
+            }
+            relative = path.relative_to(self.root).as_posix()
+            self.assets[relative] = self.load(relative, path, variants)
+
+    def load(self, relative: str, path: Path, variants: Dict[str, Path]) -> Asset:
+        media_type = media_type_for(path)
+        cache_control = IMMUTABLE_CACHE_CONTROL if relative.startswith("assets/") else REVALIDATE_CACHE_CONTROL
+        if relative != "index.html" and path.stat().st_size > self.memory_max_bytes:
+            return DiskAsset({"identity": path, **variants}, media_type, cache_control)
+        
+        asset = PrecompressedBody(
+            path.read_bytes(),
+            media_type,
+            cache_control,
+            variants={encoding: variant.read_bytes() for encoding, variant in variants.items()},
+            compress=is_compressible(media_type),
+            # Whole bundles at quality 11 would add seconds to every worker's startup
+            brotli_quality=9
+        )
+        self.memory_bytes += sum(len(body) for body in asset.bodies.values())
+        return asset
+
+    def respond(self, request: Request, path: str) -> Response:
+        asset = self.assets.get(path or "index.html")
+        if asset is None:
+            # A missing fingerprinted file is a stale or broken build; HTML in its place only hides that
+            if path.startswith("assets/") or self.index is None:
+                return Response("Not found", status_code=404, media_type="text/plain")
+            asset = self.index
+        return asset.respond(request)
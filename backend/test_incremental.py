@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from incremental import MAX_UNPAIRED_PERIODS, RunningAggregates, RunningSum
+from scoring import SERIES_FIELDS, score_financial_data
+from test_scoring import same_float
+
+@pytest.mark.parametrize("values", [
+    [],
+    [-0.0],
+    [-0.0, 2.5],
+    [1e16, 1.0, -1e16],
+    [0.1] * 10,
+    [1234.56, -0.01, 98765.4, 3.0]
+])
+def test_running_sum_matches_builtin_sum(values):
+    running = RunningSum()
+    for i, value in enumerate(values):
+        running.add(value)
+        assert same_float(running.value, sum(values[:i + 1]))
+    assert same_float(running.value, sum(values))
+
+def append_all(chunks: list) -> RunningAggregates:
+    """Append each chunk in turn, round-tripping the stored state in between as the history store does"""
+    aggregates = RunningAggregates()
+    for chunk in chunks:
+        aggregates = RunningAggregates.from_state(json.loads(json.dumps(aggregates.to_state())))
+        aggregates.append(chunk)
+    return aggregates
+
+def assert_scores_like_full_history(chunks: list):
+    full = {field: [value for chunk in chunks for value in chunk.get(field) or []] for field in SERIES_FIELDS}
+    aggregates = append_all(chunks)
+    inflows = np.array(full["cash_inflow"], dtype=np.float64)
+    assert aggregates.counts() == {field: len(values) for field, values in full.items()}
+    assert aggregates.score(lambda: inflows) == score_financial_data(full)
+
+HISTORY = {
+    "revenue": [500.0, 520.0, 480.0, 610.0],
+    "expenses": [410.0, 430.0, 470.0, 450.0],
+    "cash_inflow": [480.0, 300.0, 505.0, 590.0],
+    "cash_outflow": [420.0, 310.0, 460.0, 600.0],
+    "receivables": [90.0, 95.0, 80.0, 85.0],
+    "payables": [60.0, 70.0, 65.0, 75.0],
+    "loans": [1000.0, 950.0, 900.0, 850.0],
+    "emi": [40.0, 40.0, 40.0, 40.0]
+}
+
+def test_one_period_at_a_time():
+    assert_scores_like_full_history([{field: values[i:i + 1] for field, values in HISTORY.items()} for i in range(4)])
+
+def test_outflows_appended_before_their_inflows():
+    # positive_months must pair inflow[i] with outflow[i] whichever side arrives first
+    assert_scores_like_full_history([
+        {"cash_outflow": HISTORY["cash_outflow"][:3]},
+        {"cash_inflow": HISTORY["cash_inflow"][:1], "revenue": HISTORY["revenue"]},
+        {"cash_inflow": HISTORY["cash_inflow"][1:], "cash_outflow": HISTORY["cash_outflow"][3:]},
+        {field: values for field, values in HISTORY.items() if field not in ("revenue", "cash_inflow", "cash_outflow")}
+    ])
+
+def test_empty_series():
+    assert_scores_like_full_history([])
+    assert_scores_like_full_history([{}, {field: [] for field in SERIES_FIELDS}, {"revenue": None}])
+    assert_scores_like_full_history([{"revenue": HISTORY["revenue"], "cash_outflow": HISTORY["cash_outflow"]}])
+
+def test_mismatched_lengths():
+    # Only the first min(len(inflow), len(outflow)) periods count towards positive months
+    assert_scores_like_full_history([
+        {"cash_inflow": HISTORY["cash_inflow"] + [700.0, 10.0], "cash_outflow": HISTORY["cash_outflow"][:2]},
+        {"revenue": HISTORY["revenue"][:1], "expenses": HISTORY["expenses"], "receivables": HISTORY["receivables"][:3]}
+    ])
+
+def test_one_sided_appends_past_the_limit_are_rejected():
+    aggregates = append_all([{"cash_inflow": [1.0] * MAX_UNPAIRED_PERIODS}])
+    state = aggregates.to_state()
+    with pytest.raises(ValueError):
+        aggregates.append({"cash_inflow": [1.0]})
+    assert aggregates.to_state() == state
+    
+    # Catching up on the other side makes room again
+    aggregates.append({"cash_outflow": [0.5] * MAX_UNPAIRED_PERIODS, "cash_inflow": [1.0]})
+    assert aggregates.counts()["cash_inflow"] == MAX_UNPAIRED_PERIODS + 1
@@ -0,0 +1,77 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from routes.analysis import (
+    calculate_cash_flow_stability,
+    calculate_debt_burden,
+    calculate_expense_ratio,
+    calculate_working_capital_gap,
+)
+from scoring import SERIES_FIELDS, calculate_creditworthiness, group_seq_sum, score_batch, score_financial_data, seq_sum
+
+def baseline_scores(financial_data: dict) -> dict:
+    """The original list-based /calculate, summing with builtin sum()"""
+    scores = {
+        "cash_flow_stability": calculate_cash_flow_stability(financial_data["cash_inflow"], financial_data["cash_outflow"]),
+        "expense_ratio": calculate_expense_ratio(financial_data["revenue"], financial_data["expenses"]),
+        "working_capital": calculate_working_capital_gap(financial_data["receivables"], financial_data["payables"]),
+        "debt_burden": calculate_debt_burden(financial_data["revenue"], financial_data["loans"], financial_data["emi"])
+    }
+    creditworthiness = calculate_creditworthiness(scores)
+    return {**scores, "creditworthiness": creditworthiness, "overall_health": creditworthiness["status"]}
+
+def random_values(rng: random.Random, n: int) -> list:
+    kind = rng.choice(["money", "integers", "wide", "cancelling"])
+    if kind == "money":
+        return [round(rng.uniform(-5e4, 5e5), 2) for _ in range(n)]
+    if kind == "integers":
+        return [float(rng.randint(0, 1000)) for _ in range(n)]
+    if kind == "wide":
+        return [rng.uniform(-1, 1) * 10 ** rng.randint(-8, 16) for _ in range(n)]
+    return [rng.choice([1e16, -1e16, 1.0, -1.0, 0.1, -0.0]) for _ in range(n)]
+
+def random_financial_data(rng: random.Random) -> dict:
+    return {field: random_values(rng, rng.choice([0, 1, 3, 12, 40])) for field in SERIES_FIELDS}
+
+def same_float(a: float, b: float) -> bool:
+    return math.copysign(1, a) == math.copysign(1, b) and (a == b or (math.isnan(a) and math.isnan(b)))
+
+@pytest.mark.parametrize("seed", range(200))
+def test_seq_sum_matches_builtin_sum(seed):
+    rng = random.Random(seed)
+    values = random_values(rng, rng.randint(0, 60))
+    assert same_float(seq_sum(np.array(values, dtype=np.float64)), sum(values))
+
+def test_seq_sum_edge_cases():
+    for values in ([], [-0.0], [-0.0, -0.0], [1e308, 1e308, -1e308], [1e16, 1.0, -1e16], [0.1] * 10):
+        with np.errstate(over="ignore"):
+            assert same_float(seq_sum(np.array(values, dtype=np.float64)), sum(values))
+
+@pytest.mark.parametrize("seed", range(50))
+def test_group_seq_sum_matches_per_group_sum(seed):
+    rng = random.Random(seed)
+    n_groups = rng.randint(1, 8)
+    groups = [rng.randrange(n_groups) for _ in range(rng.randint(0, 80))]
+    values = random_values(rng, len(groups))
+    totals = group_seq_sum(np.array(values, dtype=np.float64), np.array(groups, dtype=np.intp), n_groups)
+    for group in range(n_groups):
+        assert same_float(float(totals[group]), sum(v for v, g in zip(values, groups) if g == group))
+
+@pytest.mark.parametrize("seed", range(200))
+def test_score_financial_data_matches_baseline(seed):
+    financial_data = random_financial_data(random.Random(seed))
+    assert score_financial_data(financial_data) == baseline_scores(financial_data)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_score_batch_matches_baseline(seed):
+    rng = random.Random(seed)
+    businesses = [random_financial_data(rng) for _ in range(rng.randint(1, 12))]
+    series = {}
+    for field in SERIES_FIELDS:
+        values = [value for business in businesses for value in business[field]]
+        groups = [i for i, business in enumerate(businesses) for _ in business[field]]
+        series[field] = (np.array(values, dtype=np.float64), np.array(groups, dtype=np.intp))
+    assert score_batch(series, len(businesses)) == [baseline_scores(business) for business in businesses]
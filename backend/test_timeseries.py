@@ -0,0 +1,52 @@
+import numpy as np
+
+from routes.analysis import FinancialData, timeseries_columns
+from scoring import SERIES_FIELDS, score_financial_data
+from timeseries import SCORE_COLUMNS, rolling_scores
+
+def history(n_periods: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    series = {field: np.round(rng.uniform(0, 1000, n_periods), 2) for field in SERIES_FIELDS}
+    # Expenses at exactly 75% of revenue sit on a band edge, which forces the exact rescoring path
+    series["revenue"] = np.round(series["revenue"] / 4) * 4
+    series["expenses"] = series["revenue"] * 0.75
+    return series
+
+def assert_windows_exact(series: dict, window: int):
+    n_periods = max(values.size for values in series.values())
+    columns = rolling_scores(series, window)
+    assert columns["end"].tolist() == list(range(window, n_periods + 1))
+    for k, end in enumerate(columns["end"]):
+        exact = score_financial_data({field: values[end - window:end] for field, values in series.items()})
+        for metric in SCORE_COLUMNS:
+            assert columns[metric][k] == exact[metric]["score"], (window, int(end), metric)
+        assert columns["grade"][k] == exact["creditworthiness"]["grade"]
+
+def test_windows_match_calculate_on_each_slice():
+    series = history(36)
+    for window in (2, 3, 6, 12, 36):
+        assert_windows_exact(series, window)
+
+def test_window_of_one():
+    assert_windows_exact(history(10, seed=1), 1)
+
+def test_series_that_stop_short():
+    series = history(24, seed=2)
+    series["cash_outflow"] = series["cash_outflow"][:15]
+    series["receivables"] = series["receivables"][:5]
+    series["emi"] = np.empty(0)
+    for window in (1, 3, 12):
+        assert_windows_exact(series, window)
+
+def test_window_larger_than_the_series_is_skipped():
+    financial_data = FinancialData(**{field: values.tolist() for field, values in history(5).items()})
+    result = timeseries_columns(financial_data, [3, 6, 12])
+    assert result["periods"] == 5
+    assert [entry["window"] for entry in result["windows"]] == [3]
+    assert timeseries_columns(financial_data, [6])["windows"] == []
+
+def test_duplicate_windows_are_scored_once():
+    financial_data = FinancialData(**{field: values.tolist() for field, values in history(8).items()})
+    result = timeseries_columns(financial_data, [6, 3, 6, 3])
+    assert [entry["window"] for entry in result["windows"]] == [3, 6]
+    assert result["windows"] == timeseries_columns(financial_data, [3, 6])["windows"]
@@ -0,0 +1,170 @@
+# Rolling-window scoring
+# Scores every trailing window (e.g. 3, 6 and 12 periods) across a history
+# in one vectorized pass: window totals come from prefix sums, inflow
+# variance from sliding first and second moments, and
+# score_aggregate_columns bands every window at once. Prefix sums round
+# differently from seq_sum, so each window carries an error bound; the few
+# windows whose score could change within it (a ratio on a band edge, a
+# cash flow score on an integer) are rescored with score_financial_data,
+# keeping every point identical to /api/analysis/calculate on that slice.
+
+import sys
+from typing import Dict
+
+import numpy as np
+
+from scoring import (
+    DEBT_BURDEN_BANDS,
+    EXPENSE_RATIO_BANDS,
+    SERIES_FIELDS,
+    WORKING_CAPITAL_BANDS,
+    score_aggregate_columns,
+    score_financial_data,
+)
+
+EPSILON = sys.float_info.epsilon
+
+SCORE_COLUMNS = ["cash_flow_stability", "expense_ratio", "working_capital", "debt_burden", "creditworthiness"]
+
+def prefix_sums(values: np.ndarray) -> np.ndarray:
+    return np.concatenate(([0.0], np.cumsum(values)))
+
+def near_band_edge(values: np.ndarray, tolerance: np.ndarray, bands: list) -> np.ndarray:
+    edges = np.array([band[0] for band in bands[:-1]])
+    return (np.abs(values[:, None] - edges) <= tolerance[:, None]).any(axis=1)
+
+def relative_error(error: np.ndarray, total: np.ndarray) -> np.ndarray:
+    return np.divide(error, np.abs(total), out=np.full(total.shape, np.inf), where=total != 0)
+
+def rolling_scores(series: Dict[str, np.ndarray], window: int) -> Dict[str, np.ndarray]:
+    """Scores for every window of `window` consecutive periods
+    
+    Window k covers periods [k, k + window); a series shorter than that
+    contributes only the periods it has.
+    """
+    n_periods = max(values.size for values in series.values())
+    ends = np.arange(window, n_periods + 1)
+    starts = ends - window
+    # Bound on prefix-sum and seq_sum rounding, as a multiple of the summed magnitudes
+    slack = 4 * (n_periods + 2) * EPSILON
+    
+    counts, totals, errors = {}, {}, {}
+    for field in SERIES_FIELDS:
+        values = series[field]
+        lo, hi = np.minimum(starts, values.size), np.minimum(ends, values.size)
+        sums = prefix_sums(values)
+        counts[field] = hi - lo
+        totals[field] = sums[hi] - sums[lo]
+        errors[field] = slack * prefix_sums(np.abs(values))[hi]
+    
+    inflow, outflow = series["cash_inflow"], series["cash_outflow"]
+    paired = min(inflow.size, outflow.size)
+    net_positive = np.concatenate(([0], np.cumsum((inflow[:paired] - outflow[:paired]) > 0)))
+    lo, hi = np.minimum(starts, paired), np.minimum(ends, paired)
+    positive_months = (net_positive[hi] - net_positive[lo]).astype(np.float64)
+    
+    # Sliding variance from moments about the overall mean, which keeps the
+    # s2 - s1^2/n subtraction well conditioned
+    lo, hi = np.minimum(starts, inflow.size), np.minimum(ends, inflow.size)
+    shifted = inflow - (inflow.mean() if inflow.size else 0.0)
+    first, second = prefix_sums(shifted), prefix_sums(shifted * shifted)
+    n = np.maximum(counts["cash_inflow"], 1)
+    s1, s2 = first[hi] - first[lo], second[hi] - second[lo]
+    inflow_var = np.maximum((s2 - s1 * s1 / n) / n, 0.0)
+    
+    columns = score_aggregate_columns(counts, totals, positive_months, inflow_var)
+    
+    ambiguous = rescore_candidates(columns, counts, totals, errors, positive_months, inflow_var, {
+        "s1": s1,
+        "s1_error": slack * prefix_sums(np.abs(shifted))[hi],
+        "s2_error": slack * second[hi],
+        "slack": slack
+    })
+    for k in np.flatnonzero(ambiguous):
+        exact = score_financial_data({field: values[starts[k]:ends[k]] for field, values in series.items()})
+        for metric in SCORE_COLUMNS:
+            columns[metric][k] = exact[metric]["score"]
+        columns["grade"][k] = exact["creditworthiness"]["grade"]
+        columns["expense_ratio_percent"][k] = exact["expense_ratio"]["ratio"]
+        columns["working_capital_gap"][k] = exact["working_capital"]["gap"]
+    
+    columns["end"] = ends
+    columns["rescored"] = int(np.count_nonzero(ambiguous))
+    return columns
+
+def scaled_error(value: np.ndarray, relative: np.ndarray) -> np.ndarray:
+    """|value| * relative, taken as exact where value is exactly zero"""
+    with np.errstate(invalid="ignore"):
+        return np.where(value != 0, np.abs(value) * relative, 0.0)
+
+def rescore_candidates(columns: Dict[str, np.ndarray], counts: Dict[str, np.ndarray], totals: Dict[str, np.ndarray],
+                       errors: Dict[str, np.ndarray], positive_months: np.ndarray, inflow_var: np.ndarray,
+                       moments: Dict[str, np.ndarray]) -> np.ndarray:
+    """Windows whose score could differ from an exact recompute within the rounding bounds"""
+    slack = moments["slack"]
+    # A total within its error of zero could flip an `if total` test either way
+    uncertain_zero = {
+        field: (counts[field] > 0) & (np.abs(totals[field]) <= errors[field])
+        for field in SERIES_FIELDS
+    }
+    rel = {field: relative_error(errors[field], totals[field]) + slack for field in SERIES_FIELDS}
+    revenue = np.where(totals["revenue"] != 0, totals["revenue"], 1)
+    
+    # Cash flow: score both ends of the cv interval and look for an integer between them
+    n_inflow = np.maximum(counts["cash_inflow"], 1)
+    has_cash_flow = (counts["cash_inflow"] > 0) & (counts["cash_outflow"] > 0)
+    avg_inflow = totals["cash_inflow"] / n_inflow
+    avg_error = errors["cash_inflow"] / n_inflow
+    s1, s1_error = moments["s1"], moments["s1_error"]
+    var_error = (moments["s2_error"] + (2 * np.abs(s1) + s1_error) * s1_error / n_inflow) / n_inflow + slack * inflow_var
+    positive_avg = avg_inflow - avg_error > 0
+    stability_ratio = np.divide(positive_months, np.minimum(counts["cash_inflow"], counts["cash_outflow"]),
+                                out=np.zeros(positive_months.shape), where=has_cash_flow)
+    cv_low = np.sqrt(np.maximum(inflow_var - var_error, 0)) / np.where(positive_avg, avg_inflow + avg_error, 1)
+    cv_high = np.sqrt(inflow_var + var_error) / np.where(positive_avg, avg_inflow - avg_error, 1)
+    raw_low = (stability_ratio * 60) + ((1 - np.minimum(cv_high, 1)) * 40)
+    raw_high = (stability_ratio * 60) + ((1 - np.minimum(cv_low, 1)) * 40)
+    raw = columns["cash_flow_raw"]
+    cash_flow = has_cash_flow & (
+        (np.abs(avg_inflow) <= avg_error)
+        | (positive_avg & ((np.trunc(raw_low) != np.trunc(raw_high)) | (np.abs(raw - np.round(raw)) < 1e-9)))
+    )
+    
+    # Expense ratio against its band edges
+    has_expenses = (counts["revenue"] > 0) & (counts["expenses"] > 0)
+    ratio = columns["expense_ratio_percent"]
+    expense = has_expenses & (
+        uncertain_zero["revenue"]
+        | ((totals["revenue"] != 0)
+           & near_band_edge(ratio, scaled_error(ratio, rel["revenue"] + rel["expenses"]), EXPENSE_RATIO_BANDS))
+    )
+    
+    # Working capital gap ratio against its band edges
+    has_working_capital = (counts["receivables"] > 0) & (counts["payables"] > 0)
+    avg_payables = totals["payables"] / np.maximum(counts["payables"], 1)
+    avg_payables_error = errors["payables"] / np.maximum(counts["payables"], 1)
+    gap_error = (errors["receivables"] / np.maximum(counts["receivables"], 1) + avg_payables_error
+                 + slack * np.abs(columns["working_capital_gap"]))
+    gap_ratio = columns["gap_ratio"]
+    gap_tolerance = 2 * np.divide(gap_error + np.abs(gap_ratio) * avg_payables_error, avg_payables,
+                                  out=np.zeros(gap_ratio.shape), where=avg_payables > 0)
+    working_capital = has_working_capital & (
+        (np.abs(avg_payables) <= avg_payables_error)
+        | ((avg_payables > 0) & near_band_edge(gap_ratio, gap_tolerance, WORKING_CAPITAL_BANDS))
+    )
+    
+    # Debt burden: zero tests on revenue, EMI and loans, then the combined ratio
+    debt_service = totals["emi"] / revenue * 100
+    debt_to_revenue = np.minimum(np.abs(totals["loans"] / revenue * 100), 100)
+    combined = columns["debt_combined_ratio"]
+    combined_tolerance = 2 * (
+        0.6 * scaled_error(debt_service, rel["emi"] + rel["revenue"])
+        + 0.4 * scaled_error(debt_to_revenue, rel["loans"] + rel["revenue"])
+        + slack * np.abs(combined)
+    )
+    debt = (counts["revenue"] > 0) & (
+        uncertain_zero["revenue"] | uncertain_zero["emi"] | uncertain_zero["loans"]
+        | ((totals["revenue"] != 0) & near_band_edge(combined, combined_tolerance, DEBT_BURDEN_BANDS))
+    )
+    
+    return cash_flow | expense | working_capital | debt
@@ -1,5 +1,9 @@
 const API_BASE = '/api';
 
+// Bodies of responses that carried an ETag, replayed when the server answers 304
+const MAX_ETAG_ENTRIES = 50;
+const etagCache = new Map<string, { etag: string; data: unknown }>();
+
 async function request<T>(
   endpoint: string,
   options: RequestInit = {}
@@ -15,17 +19,37 @@ async function request<T>(
     (headers as Record<string, string>)['Authorization'] = `Bearer ${token}`;
   }
 
+  const cacheKey = `${options.method ?? 'GET'} ${endpoint} ${options.body ?? ''}`;
+  const cached = etagCache.get(cacheKey);
+  if (cached) {
+    (headers as Record<string, string>)['If-None-Match'] = cached.etag;
+  }
+
   const response = await fetch(`${API_BASE}${endpoint}`, {
     ...options,
     headers,
   });
 
+  if (response.status === 304 && cached) {
+    return cached.data as T;
+  }
+
   if (!response.ok) {
     const error = await response.json().catch(() => ({ detail: 'Request failed' }));
     throw new Error(error.detail || 'Request failed');
   }
 
-  return response.json();
+  const data = await response.json();
+  const etag = response.headers.get('ETag');
+  if (etag) {
+    etagCache.delete(cacheKey);
+    etagCache.set(cacheKey, { etag, data });
+    if (etagCache.size > MAX_ETAG_ENTRIES) {
+      etagCache.delete(etagCache.keys().next().value as string);
+    }
+  }
+
+  return data;
 }
 
 export const api = {
@@ -89,7 +89,7 @@ export default function DashboardPage() {
         description: `Detected ${result.summary.columns_detected.length} financial columns`,
       });
 
-      await runAnalysis(result.financial_data);
+      await runAnalysis(result.financial_data, result.upload_id);
     } catch (error) {
       toast({
         title: 'Upload failed',
@@ -101,11 +101,13 @@ export default function DashboardPage() {
     }
   };
 
-  const runAnalysis = async (data: Record<string, number[]>) => {
+  const runAnalysis = async (data: Record<string, number[]>, uploadId?: number | null) => {
     setIsAnalyzing(true);
     try {
       const result = await api.post<AnalysisData>('/analysis/calculate', {
         financial_data: data,
+        upload_id: uploadId ?? undefined,
+        industry: profile?.industry,
       });
       setAnalysisData(result);
 